@@ -1,18 +1,24 @@
 import sqlite3
 import requests
 import time
-from datetime import datetime
 import logging
 import os
 import traceback
 import sys
 import json
+import threading
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 # Python not looking in parent directories for common files you might want to use is stupid
 sys.path.append("../")
 from diet_logger import setup_logger
+from scheduler import Scheduler
+from db_utils import create_general_tables, check_query_plans, configure_connection, run_maintenance, format_maintenance
+from face_atlas import build_face_atlas
+from showcase_processor import process_showcase, process_submissions
 
 
 LOG_LEVEL = logging.INFO
@@ -22,11 +28,31 @@ API_URL = "https://ip1.realwizardhosting.online:7070/api"
 DB_FILE = "../db/atlascivs.db"
 
 SKIN_TTL_HOURS = 8
+SKIN_FETCH_CONCURRENCY = 8
 BODY_SKIN_API_URL = "https://starlightskins.lunareclipse.studio/render/ultimate/{uuid}/full?capeEnabled=false"
-BODY_SKINS_DIR = "../db/player_body_skins"
-
 FACE_SKIN_API_URL = "https://mc-heads.net/avatar/{uuid}/8"   # Should really just use the Mojang API
-FACE_SKINS_DIR = "../db/player_face_skins"
+
+SHOWCASE_IMAGES_DIR = "../db/showcase_imgs"
+SHOWCASE_SUBMISSIONS_DIR = "../db/showcase_submissions"
+
+# Task intervals in seconds
+PLAYERS_INTERVAL = 2
+KILLS_INTERVAL = 2
+SERVER_INFO_INTERVAL = 30
+SKINS_INTERVAL = 5 * 60
+MAINTENANCE_INTERVAL = 60 * 60
+SHOWCASE_INTERVAL = 60
+
+WRITE_WARN_AFTER = 0.5  # Seconds a commit can take before it is logged as slow. Whole task runs include network time, see `ScheduledTask`
+
+# Tasks run in their own threads, so writes on the shared connection are serialized
+db_lock = threading.Lock()
+
+# Keep-alive connections to the skin APIs, shared by the skin fetching threads
+http_session = requests.Session()
+http_session.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=4, pool_maxsize=SKIN_FETCH_CONCURRENCY * 2
+))
 
 
 
@@ -36,269 +62,420 @@ class BadGatewayError(Exception):
         super().__init__(self.message)
 
 
-def upsert_variable(variable: str, value: str) -> None:    # the shitfuck
+def connect_db() -> sqlite3.Connection:
     """
-    Upserts a value in the miscellaneous `variables` table.
-    Variable names and values are stored as the `TEXT` type.
+    Opens the long-lived connection used by the updater tasks.
+    Each task run writes through this connection and commits once.
     """
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)  # Shared by the scheduler's threads, see `db_lock`
+    configure_connection(conn)
 
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO variables (variable, value)
-            VALUES (?, ?)
-            ON CONFLICT(variable) DO UPDATE SET 
-                value = excluded.value
-        """, (str(variable), str(value)))
+    return conn
 
-        conn.commit()
 
+def fetch_api(endpoint: str, params: dict = None):
+    """
+    GETs an AC-API endpoint and returns the parsed JSON, or `None` if the request failed.
+    Network requests happen outside of any DB transaction, so the write lock is only held for the writes.
+    """
+    response = requests.get(API_URL + endpoint, params=params, timeout=20)
+    log.debug(f"Got response from API ({endpoint})")
 
-def update_players_table() -> None:
-    log.debug("Updating players table...")
+    if response.status_code == 200:
+        return response.json()
+    elif response.status_code == 502:
+        raise BadGatewayError("API server returned 502 Bad Gateway. Is server offline or restarting?")
+    else:
+        log.warning(f"Failed to fetch {endpoint}: {response.status_code}")
+        return None
 
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        response = requests.get(API_URL + "/online_players", timeout=20)
-        log.debug("Got response from API")
 
-        start_time = time.time()
-        if response.status_code == 200:
-            data = response.json()
-            online_players = data.get("online_players", {})
-
-            for uuid, player_data in online_players.items():
-                name = player_data.get("name")
-                online_duration = player_data.get("online_duration", 0)
-                afk_duration = player_data.get("afk_duration", 0)
-                bio = player_data.get("bio", "")
-                first_joined = player_data.get("first_joined", 0)
-                last_online = int(time.time() * 1000)   # convert to ms, as that is what we do everywhere
-
-                # NOTE: online_duration and afk_duration can still be non-zero even if the player is offline
-                cursor.execute("""
-                    INSERT INTO players (
-                        uuid, name, online_duration, afk_duration, bio, first_joined, last_online
-                    ) VALUES (
-                        ?, ?, ?, ?, ?, ?, ?
-                    ) ON CONFLICT(uuid) DO UPDATE SET
-                        name = excluded.name,
-                        online_duration = excluded.online_duration,
-                        afk_duration = excluded.afk_duration,
-                        bio = excluded.bio,
-                        first_joined = excluded.first_joined,
-                        last_online = excluded.last_online
-                """, (uuid, name, online_duration, afk_duration, bio, first_joined, last_online))
-            log.debug("Executed SQL commands")
-
-            # Offline players should have their online_duration reset to 0
-            cursor.execute("""
-                UPDATE players
-                SET online_duration = 0
-                WHERE uuid NOT IN (
-                    SELECT value FROM json_each(?)
-                )
-            """, (json.dumps(list(online_players.keys())),))
-            log.debug("Executed SQL commands")
+def upsert_variables(cursor: sqlite3.Cursor, variables: dict) -> None:
+    """
+    Upserts values in the miscellaneous `variables` table in one statement.
+    Variable names and values are stored as the `TEXT` type.
+    """
+    cursor.executemany("""
+        INSERT INTO variables (variable, value)
+        VALUES (?, ?)
+        ON CONFLICT(variable) DO UPDATE SET 
+            value = excluded.value
+    """, [(str(variable), str(value)) for variable, value in variables.items()])
 
-            conn.commit()
-            log.debug("Committed SQL commands")
 
-            upsert_variable("last_players_update", int(time.time() * 1000))
-            log.debug("Updated last_players_update variable")
+def update_players_table(cursor: sqlite3.Cursor, data: dict) -> dict:
+    """
+    Writes the `/online_players` response to the players table.
+    Returns the variables to upsert once the cycle is done.
+    """
+    log.debug("Updating players table...")
+    start_time = time.time()
 
-        elif response.status_code == 502:
-            raise BadGatewayError("API server returned 502 Bad Gateway. Is server offline or restarting?")
-        else:
-            log.warning(f"Failed to fetch player data: {response.status_code}")
+    online_players = data.get("online_players", {})
+    last_online = int(time.time() * 1000)   # convert to ms, as that is what we do everywhere
+
+    # NOTE: online_duration and afk_duration can still be non-zero even if the player is offline
+    cursor.executemany("""
+        INSERT INTO players (
+            uuid, name, online_duration, afk_duration, bio, first_joined, last_online, updated_at
+        ) VALUES (
+            ?, ?, ?, ?, ?, ?, ?, ?
+        ) ON CONFLICT(uuid) DO UPDATE SET
+            name = excluded.name,
+            online_duration = excluded.online_duration,
+            afk_duration = excluded.afk_duration,
+            bio = excluded.bio,
+            first_joined = excluded.first_joined,
+            last_online = excluded.last_online,
+            updated_at = excluded.updated_at
+    """, [
+        (
+            uuid,
+            player_data.get("name"),
+            player_data.get("online_duration", 0),
+            player_data.get("afk_duration", 0),
+            player_data.get("bio", ""),
+            player_data.get("first_joined", 0),
+            last_online,
+            last_online     # updated_at. `last_online` always changes for online players, so they always count as updated
+        )
+        for uuid, player_data in online_players.items()
+    ])
+
+    # Offline players should have their online_duration reset to 0.
+    # Only the ones that just went offline, so everyone else's `updated_at` stays put
+    cursor.execute("""
+        UPDATE players
+        SET online_duration = 0, updated_at = ?
+        WHERE online_duration IS NOT 0 AND uuid NOT IN (
+            SELECT value FROM json_each(?)
+        )
+    """, (last_online, json.dumps(list(online_players.keys()))))
+    log.debug("Executed SQL commands")
 
     end_time = time.time()
     log.debug(f"Players table updated in {round((end_time - start_time) * 1000, 3)}ms")   # Does not include network request time
 
+    return {"last_players_update": int(time.time() * 1000)}
 
-def update_kills_table() -> None:
-    log.debug("Updating kills table...")
 
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        response = requests.get(API_URL + "/kill_history", timeout=20)
-        log.debug("Got response from API")
+def get_kills_cursor(cursor: sqlite3.Cursor) -> int:
+    """
+    Returns the timestamp of the newest kill that has been ingested.
+    Kills at exactly this timestamp are refetched, and deduplicated by the `kills_dedup` index.
+    """
+    cursor.execute("SELECT value FROM variables WHERE variable = 'kills_cursor'")
+    result = cursor.fetchone()
+    if result:
+        return int(result[0])
+
+    cursor.execute("SELECT MAX(timestamp) FROM kills")
+    return cursor.fetchone()[0] or 0  # Default to 0 if no kills exist
 
-        start_time = time.time()
-        
-        cursor.execute("SELECT MAX(timestamp) FROM kills")
-        last_timestamp = cursor.fetchone()[0] or 0  # Default to 0 if no kills exist
-
-        if response.status_code == 200:
-            kills_data = response.json()
-
-            for kill_entry in kills_data:
-                killer_uuid = kill_entry.get("killer_uuid")
-                killer_name = kill_entry.get("killer_name")
-                victim_uuid = kill_entry.get("victim_uuid")
-                victim_name = kill_entry.get("victim_name")
-                death_message = kill_entry.get("death_message")
-                weapon = kill_entry.get("weapon")
-                timestamp = kill_entry.get("timestamp")
-
-                if timestamp > last_timestamp:
-                    cursor.execute("""
-                        INSERT INTO kills (
-                            killer_uuid, killer_name, victim_uuid, victim_name, death_message, weapon_json, timestamp
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        killer_uuid,
-                        killer_name,
-                        victim_uuid,
-                        victim_name,
-                        death_message,
-                        json.dumps(weapon) if weapon else None,
-                        timestamp
-                    ))
-
-            log.debug("Executed SQL commands")
-            conn.commit()
-            log.debug("Committed SQL commands")
-            upsert_variable("last_kills_update", int(time.time() * 1000))
-
-        elif response.status_code == 502:
-            raise BadGatewayError("API server returned 502 Bad Gateway. Is server offline or restarting?")
-        else:
-            log.warning(f"Failed to fetch kills data: {response.status_code}")
+
+def update_kills_table(cursor: sqlite3.Cursor, kills_data: list) -> dict:
+    """
+    Inserts the kills from the `/kill_history` response that are at or after the kills cursor.
+    Returns the variables to upsert once the cycle is done, including the new cursor.
+    """
+    log.debug("Updating kills table...")
+    start_time = time.time()
+
+    kills_cursor = get_kills_cursor(cursor)
+    new_kills = [kill_entry for kill_entry in kills_data if kill_entry.get("timestamp") >= kills_cursor]
+
+    # OR IGNORE, as kills at the cursor's timestamp (or a retried request) are already in the table
+    cursor.executemany("""
+        INSERT OR IGNORE INTO kills (
+            killer_uuid, killer_name, victim_uuid, victim_name, death_message, weapon_json, timestamp
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (
+            kill_entry.get("killer_uuid"),
+            kill_entry.get("killer_name"),
+            kill_entry.get("victim_uuid"),
+            kill_entry.get("victim_name"),
+            kill_entry.get("death_message"),
+            json.dumps(kill_entry.get("weapon")) if kill_entry.get("weapon") else None,
+            kill_entry.get("timestamp")
+        )
+        for kill_entry in new_kills
+    ])
+    log.debug(f"Inserted {cursor.rowcount} new kills")
 
     end_time = time.time()
     log.debug(f"Kills table updated in {round((end_time - start_time) * 1000, 3)}ms")
 
+    return {
+        "last_kills_update": int(time.time() * 1000),
+        "kills_cursor": max([kills_cursor] + [kill_entry.get("timestamp") for kill_entry in new_kills])
+    }
 
-def update_skin_dir(type) -> None:
-    # Could honestly just store the face image in the players table. They are only about 160 bytes each.
-    log.debug(f"Updating {type} skins...")
 
-    start_time = time.time()
+def update_server_info_table(cursor: sqlite3.Cursor, data: dict) -> dict:
+    """
+    Returns the `/server_info` response as variables to upsert once the cycle is done.
+    """
+    return {
+        "weather": data.get("weather"),
+        "world_time_24h": data.get("world_time_24h"),
+        "day": data.get("day"),
+        "system_time": data.get("system_time"),
+        "acapi_version": data.get("acapi_version"),
+        "acapi_build": data.get("acapi_build")
+    }
+
 
-    os.makedirs(BODY_SKINS_DIR, exist_ok=True)
-    os.makedirs(FACE_SKINS_DIR, exist_ok=True)
+def run_update(conn: sqlite3.Connection, endpoint: str, writer, params: dict = None) -> None:
+    """
+    Fetches an AC-API endpoint, then writes it and its variables in a single transaction.
+    The network request happens first, so the write lock is only held for the writes.
+
+    `param writer` One of the `update_*_table` functions. Returns the variables to upsert.
+    `param params` Query parameters for the request.
+    """
+    data = fetch_api(endpoint, params)
+    if data is None:
+        return
 
-    with sqlite3.connect(DB_FILE) as conn:
+    start_time = time.time()
+
+    with db_lock, conn:  # Commits once on success, rolls back everything on failure
         cursor = conn.cursor()
+        variables = writer(cursor, data)
+        upsert_variables(cursor, variables)
+
+    end_time = time.time()
+    log.debug(f"Committed {endpoint} in {round((end_time - start_time) * 1000, 3)}ms")   # Does not include network request time
+    if end_time - start_time > WRITE_WARN_AFTER:
+        log.warning(f"Committing {endpoint} took {round((end_time - start_time) * 1000, 3)}ms (limit {WRITE_WARN_AFTER * 1000}ms)")
+
+
+def update_kills(conn: sqlite3.Connection) -> None:
+    """
+    Only asks AC-API for kills since the cursor. If `since` isn't supported upstream it is ignored,
+    and `update_kills_table` filters the full history instead.
+    """
+    with db_lock:
+        kills_cursor = get_kills_cursor(conn.cursor())
 
-        cursor.execute("SELECT uuid FROM players")
-        players = cursor.fetchall()
+    run_update(conn, "/kill_history", update_kills_table, params={"since": kills_cursor})
 
-    current_time = time.time()
 
-    for (uuid,) in players:
-        if type == "body": skin_path = os.path.join(BODY_SKINS_DIR, f"{uuid}.png")
-        elif type == "face": skin_path = os.path.join(FACE_SKINS_DIR, f"{uuid}.png")
+def fetch_skin(type: str, uuid: str, etag: str, last_modified: str, content_hash: str, has_image: bool):
+    """
+    Fetches one skin, sending the validators from the last fetch so unchanged skins come back as 304.
+    The image is only returned if the content actually changed, so unchanged ones aren't rewritten.
 
-        if os.path.exists(skin_path):
-            last_modified_time = os.path.getmtime(skin_path)
-            if current_time - last_modified_time < SKIN_TTL_HOURS * 3600:
-                continue    # Skip if skin is still fresh
+    Returns the new `skins` row, or `None` if the fetch failed (so it is retried next run).
+    """
+    if type == "body":
+        url = BODY_SKIN_API_URL.format(uuid=uuid)
+    elif type == "face":
+        url = FACE_SKIN_API_URL.format(uuid=uuid)
 
-        if type == "body": response = requests.get(BODY_SKIN_API_URL.format(uuid=uuid), timeout=20)
-        elif type == "face": response = requests.get(FACE_SKIN_API_URL.format(uuid=uuid), timeout=20)
+    headers = {}
+    if has_image:   # Otherwise a 304 would leave it with nothing to serve
+        if etag: headers["If-None-Match"] = etag
+        if last_modified: headers["If-Modified-Since"] = last_modified
 
-        if response.status_code == 200:
-            with open(skin_path, "wb") as skin_file:
-                skin_file.write(response.content)
-            log.debug(f"Updated {type} skin for UUID: {uuid}")
-        else:
-            log.warning(f"Failed to fetch {type} skin for UUID {uuid}: HTTP {response.status_code}")
+    try:
+        response = http_session.get(url, headers=headers, timeout=20)
+    except requests.exceptions.RequestException as e:  # Not super critical, sometimes the APIs go down
+        log.warning(f"Failed to fetch {type} skin for UUID {uuid}: {e}")
+        return None
 
+    checked_at = int(time.time() * 1000)
 
-    end_time = time.time()
-    log.debug(f"Player face skins updated in {round((end_time - start_time) * 1000, 3)}ms")   # Includes network request time
+    if response.status_code == 304:
+        return (uuid, type, etag, last_modified, content_hash, checked_at, None)
+
+    if response.status_code != 200:
+        log.warning(f"Failed to fetch {type} skin for UUID {uuid}: HTTP {response.status_code}")
+        return None
+
+    new_hash = hashlib.sha256(response.content).hexdigest()
+    image = None
+    if new_hash != content_hash or not has_image:
+        image = response.content
+        log.debug(f"Updated {type} skin for UUID: {uuid}")
+
+    return (
+        uuid, type,
+        response.headers.get("ETag"), response.headers.get("Last-Modified"),
+        new_hash, checked_at, image
+    )
+
+
+def next_skins_version(conn: sqlite3.Connection) -> int:
+    """
+    A new `last_skins_update`, always later than the last one. Also what changed skins are stamped with.
+    The webserver loads the skins stamped since the version it last saw, so call it inside `db_lock`
+    and commit in the same transaction, or a commit could end up with older stamps than one before it.
+    """
+    last = conn.execute("SELECT value FROM variables WHERE variable = 'last_skins_update'").fetchone()
 
+    return max(int(time.time() * 1000), int(last[0]) + 1 if last else 0)
 
-def update_server_info_table() -> None:
-    log.debug("Updating server info...")
 
-    response = requests.get(API_URL + "/server_info", timeout=20)
-    log.debug("Got response from API")
+def update_skin_dir(conn: sqlite3.Connection, type: str) -> None:
+    """
+    Refetches every `type` ("body" or "face") skin that hasn't been checked in `SKIN_TTL_HOURS`.
+    Freshness is tracked in the `skins` table, and skins are fetched `SKIN_FETCH_CONCURRENCY` at a time.
+    The images are stored in `skins.image`, and `last_skins_update` is bumped if any changed so the webserver reloads them.
+    """
+    log.debug(f"Updating {type} skins...")
 
     start_time = time.time()
 
-    if response.status_code == 200:
-        data = response.json()
-        weather = data.get("weather")
-        world_time_24h = data.get("world_time_24h")
-        day = data.get("day")
-
-        system_time = data.get("system_time")
-        api_version = data.get("acapi_version")
-        api_build = data.get("acapi_build")
-
-        # because 3 discrete DB operations is better than one, right?
-        upsert_variable("weather", weather)
-        upsert_variable("world_time_24h", world_time_24h)
-        upsert_variable("day", day)
-        upsert_variable("system_time", system_time)
-        upsert_variable("acapi_version", api_version)
-        upsert_variable("acapi_build", api_build)
-        log.debug("Updated variables")
-    elif response.status_code == 502:
-        raise BadGatewayError("API server returned 502 Bad Gateway. Is server offline or restarting?")
-    else:
-        log.warning(f"Failed to fetch server info: {response.status_code}")
+    stale_before = int((time.time() - SKIN_TTL_HOURS * 3600) * 1000)
+    with db_lock:
+        stale_skins = conn.execute("""
+            SELECT players.uuid, skins.etag, skins.last_modified, skins.content_hash, skins.image IS NOT NULL
+            FROM players
+            LEFT JOIN skins ON skins.uuid = players.uuid AND skins.type = ?
+            WHERE skins.last_checked IS NULL OR skins.last_checked < ?
+        """, (type, stale_before)).fetchall()
+
+    if not stale_skins:
+        return
+
+    with ThreadPoolExecutor(max_workers=SKIN_FETCH_CONCURRENCY, thread_name_prefix=f"{type}_skins") as executor:
+        results = [result for result in executor.map(lambda row: fetch_skin(type, *row), stale_skins) if result is not None]
+
+    changed = sum(1 for result in results if result[6] is not None)
+
+    with db_lock, conn:
+        # Stamped here rather than when fetched, as the body and face tasks run at the same time
+        changed_at = next_skins_version(conn)
+
+        # A `NULL` image means unchanged, so the stored one is kept
+        conn.executemany("""
+            INSERT INTO skins (uuid, type, etag, last_modified, content_hash, last_checked, image, changed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(uuid, type) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                content_hash = excluded.content_hash,
+                last_checked = excluded.last_checked,
+                image = COALESCE(excluded.image, image),
+                changed_at = CASE WHEN excluded.image IS NULL THEN changed_at ELSE excluded.changed_at END
+        """, [result + (changed_at,) for result in results])
+
+        if changed:
+            variables = {"last_skins_update": changed_at}
+
+            # Players are sent with their skin's hash (for its URL), so they count as updated too
+            if type == "body":
+                conn.executemany(
+                    "UPDATE players SET updated_at = ? WHERE uuid = ?",
+                    [(changed_at, result[0]) for result in results if result[6] is not None]
+                )
+                variables["last_players_update"] = changed_at
+
+            upsert_variables(conn.cursor(), variables)
 
     end_time = time.time()
-    log.debug(f"Server info updated in {round((end_time - start_time) * 1000, 3)}ms")   # Does not include network request time
+    log.debug(f"Checked {len(stale_skins)} {type} skins, {changed} changed, in {round((end_time - start_time) * 1000, 3)}ms")   # Includes network request time
 
-# TODO: 
-# Restart the script every 2 hours in case the internet goes out.
-# When the internet comes back, it has a bug where it will stop updating.
 
-if __name__ == "__main__":
-    try:
-        log = setup_logger(LOG_FILE, LOG_LEVEL)
-        log.info("---- Starting DB Updater ----")
+def update_face_atlas(conn: sqlite3.Connection) -> None:
+    """
+    Rebuilds the `face_atlas` if any face changed since it was last built.
+    Bumps `last_skins_update` again once it's stored, so the webserver reloads it. The atlas URL has its own hash,
+    so this doesn't change any skin URLs.
+    """
+    with db_lock:
+        latest_change = conn.execute("""
+            SELECT COALESCE(MAX(changed_at), 0) FROM skins WHERE type = 'face' AND image IS NOT NULL
+        """).fetchone()[0]
+        atlas_version = conn.execute("SELECT version FROM face_atlas WHERE id = 1").fetchone()
 
-        while True: 
-            """TODO: 
-            Should be async, so we can have different intervals for different tasks.
-            chat should be updated frequently, but towns only needs to be ran every few minutes.
+        if atlas_version is not None and atlas_version[0] >= latest_change:
+            return
 
-            Should raise an error if an update takes longer than a few hundred milliseconds
-            """
+        # Sorted so the layout only moves around when players are added
+        faces = conn.execute("""
+            SELECT uuid, image FROM skins WHERE type = 'face' AND image IS NOT NULL ORDER BY uuid
+        """).fetchall()
 
-            start_time = time.time()
+    start_time = time.time()
+    image, offsets = build_face_atlas(faces)
 
-            update_players_table()
-            update_kills_table()
-            update_server_info_table()
+    with db_lock, conn:
+        conn.execute("""
+            INSERT INTO face_atlas (id, version, image, offsets) VALUES (1, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                version = excluded.version, image = excluded.image, offsets = excluded.offsets
+        """, (latest_change, image, json.dumps(offsets, separators=(",", ":"))))
+        upsert_variables(conn.cursor(), {"last_skins_update": next_skins_version(conn)})
 
-            try:
-                update_skin_dir("body")
-                update_skin_dir("face")
-            except Exception as e:  # Not super critical, sometimes the APIs go down
-                log.warning(f"Failed to update skins: {e}")
+    end_time = time.time()
+    log.debug(f"Built face atlas of {len(offsets['faces'])} faces ({len(image)} bytes) in {round((end_time - start_time) * 1000, 3)}ms")
 
-            end_time = time.time()
 
-            # Print to not fill log file
-            print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} Time to update general DB was {round((end_time - start_time) * 1000, 2)}ms")
+def update_faces(conn: sqlite3.Connection) -> None:
+    update_skin_dir(conn, "face")
+    update_face_atlas(conn)
 
-            time.sleep(2)
 
+def process_showcase_images() -> None:
+    """
+    Checks and cleans up new submissions from the webserver, and makes the WebP variants of any new or changed
+    showcase images. See `showcase_processor.py`.
+    """
+    if os.path.isdir(SHOWCASE_SUBMISSIONS_DIR):
+        start_time = time.time()
+        processed = process_submissions(SHOWCASE_SUBMISSIONS_DIR, log)
 
-    # This generally isn't a thing anymore, as its now behind Cloudflare. CF will return 502 instead of this throwing an error.
-    # This still happens on occasion however, so we still catch it.
-    except (BadGatewayError, requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
-        # When the server restarts, it can rarely cause requests to not be able to reconnect.
-        # This should restart the script and fix the issue, hopefully.
-        # We dont log the error, as its probably just the server restarting.
+        if processed:
+            log.info(f"Processed {processed} showcase submissions in {round((time.time() - start_time) * 1000, 3)}ms")
 
-        # TODO: when the server goes offline (say for maintenance) this will not trigger the website to report
-        # an outdated status
+    if os.path.isdir(SHOWCASE_IMAGES_DIR):
+        start_time = time.time()
+        processed = process_showcase(SHOWCASE_IMAGES_DIR, log)
 
-        log.info(f"Connection timed out. Restarting in 30s")
+        if processed:
+            log.info(f"Processed {processed} showcase images in {round((time.time() - start_time) * 1000, 3)}ms")
 
-        time.sleep(30)
 
-        log.info("Restarting script (timeout)...")
-        os.execl(sys.executable, sys.executable, *sys.argv) 
+def maintain_db(conn: sqlite3.Connection) -> None:
+    # Holds the write lock throughout, so the checkpoint isn't racing this script's own commits
+    with db_lock:
+        result = run_maintenance(conn, DB_FILE)
+
+    log.info(f"DB maintenance: {format_maintenance(result)}")
+
+
+# TODO: 
+# Restart the script every 2 hours in case the internet goes out.
+# When the internet comes back, it has a bug where it will stop updating.
+
+if __name__ == "__main__":
+    try:
+        log = setup_logger(LOG_FILE, LOG_LEVEL)
+        log.info("---- Starting DB Updater ----")
+
+        create_general_tables()
+        for name, detail in check_query_plans():
+            log.warning(f"Hot query `{name}` does a full table scan: {detail}")
+        conn = connect_db()
+
+        # Each task gets its own interval, so a slow skin CDN doesn't hold up the kill feed.
+        # API errors are backed off per task instead of restarting the whole script.
+        scheduler = Scheduler(log, quiet_errors=(
+            BadGatewayError, requests.exceptions.ConnectionError, requests.exceptions.Timeout
+        ))
+        scheduler.add_task("players", lambda: run_update(conn, "/online_players", update_players_table), PLAYERS_INTERVAL)
+        scheduler.add_task("kills", lambda: update_kills(conn), KILLS_INTERVAL)
+        scheduler.add_task("server_info", lambda: run_update(conn, "/server_info", update_server_info_table), SERVER_INFO_INTERVAL)
+        scheduler.add_task("body_skins", lambda: update_skin_dir(conn, "body"), SKINS_INTERVAL, timeout=SKINS_INTERVAL, warn_after=60)
+        scheduler.add_task("face_skins", lambda: update_faces(conn), SKINS_INTERVAL, timeout=SKINS_INTERVAL, warn_after=60)
+        scheduler.add_task("showcase", process_showcase_images, SHOWCASE_INTERVAL, timeout=10 * 60, warn_after=60)
+        scheduler.add_task("maintenance", lambda: maintain_db(conn), MAINTENANCE_INTERVAL, timeout=5 * 60, warn_after=10)
+
+        scheduler.run()
+
 
     except Exception:
         log.error(traceback.format_exc())
@@ -1,4 +1,7 @@
 import sqlite3
+import hashlib
+import time
+import sys
 import os
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
@@ -6,10 +9,98 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 DB_FILE = "../db/atlascivs.db"
 STATS_DB_FILE = "../db/atlas_stats.db"
 
+BUSY_TIMEOUT = 5000                 # ms a connection waits for a lock before failing with "database is locked"
+MMAP_SIZE = 256 * 1024 * 1024       # Reads go through a memory map instead of a read() per page. Only uses what the file needs
+INCREMENTAL_VACUUM_PAGES = 2000     # Max free pages returned to the OS per maintenance run, so it never holds the lock for long
+
+# Where the skins used to be saved as files, before they were stored in `skins.image`
+OLD_BODY_SKINS_DIR = "../db/player_body_skins"
+OLD_FACE_SKINS_DIR = "../db/player_face_skins"
+
+
+def configure_connection(conn) -> None:
+    """
+    Per connection pragmas, for every connection the updaters open.
+    """
+    # With WAL, NORMAL only syncs on checkpoints. A power cut can lose the last few commits, but never corrupts the DB
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+
+
+def enable_wal(conn) -> None:
+    """
+    Puts the DB in WAL mode, so the webserver's reads don't wait on the updaters' writes or the other way around.
+    Also switches it to incremental auto vacuum, for `run_maintenance()`. Both are stored in the file, so this only
+    changes anything the first time.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:  # 2 is INCREMENTAL
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")  # Only takes effect after a VACUUM, which rewrites the whole file. Only ever once though
+
+    conn.execute("PRAGMA journal_mode = WAL")
+    configure_connection(conn)
+
+
+def get_db_sizes(db_file) -> tuple:
+    """
+    Returns the size of the DB and its WAL in bytes.
+    """
+    wal_file = f"{db_file}-wal"
+
+    return os.path.getsize(db_file), os.path.getsize(wal_file) if os.path.exists(wal_file) else 0
+
+
+def run_maintenance(conn, db_file) -> dict:
+    """
+    Checkpoints and truncates the WAL, lets SQLite refresh its query planner stats, and returns free pages to the OS.
+    Uses `main.` for everything, so it only touches `db_file` even if other DBs are attached.
+    Commits any open transaction first.
+
+    Returns what was done, for logging.
+    """
+    start_time = time.time()
+    db_size_before, wal_size_before = get_db_sizes(db_file)
+
+    conn.execute("PRAGMA main.optimize")
+
+    free_pages = conn.execute("PRAGMA main.freelist_count").fetchone()[0]
+    # `executescript()`, as `execute()` only steps it once, which frees a single page
+    conn.executescript(f"PRAGMA main.incremental_vacuum({INCREMENTAL_VACUUM_PAGES})")
+    vacuumed = free_pages - conn.execute("PRAGMA main.freelist_count").fetchone()[0]
+
+    # Last, so the vacuumed pages are written back and the file actually shrinks.
+    # `busy` is 1 if a reader was still using the WAL, so it couldn't all be checkpointed. It'll get done next time
+    busy = conn.execute("PRAGMA main.wal_checkpoint(TRUNCATE)").fetchone()[0]
+
+    db_size, wal_size = get_db_sizes(db_file)
+
+    return {
+        "db_size": db_size,
+        "wal_size": wal_size,
+        "db_size_before": db_size_before,
+        "wal_size_before": wal_size_before,
+        "checkpoint_busy": bool(busy),
+        "vacuumed_pages": vacuumed,
+        "duration_ms": round((time.time() - start_time) * 1000, 3)
+    }
+
+
+def format_maintenance(result: dict) -> str:
+    mb = lambda size: f"{size / 1024 / 1024:.2f}MB"
+
+    return (
+        f"DB {mb(result['db_size_before'])} -> {mb(result['db_size'])}, "
+        f"WAL {mb(result['wal_size_before'])} -> {mb(result['wal_size'])}, "
+        f"vacuumed {result['vacuumed_pages']} pages, "
+        f"{'checkpoint incomplete (readers busy), ' if result['checkpoint_busy'] else ''}in {result['duration_ms']}ms"
+    )
+
 
 # what the fuck is database normalization
 def create_general_tables(db_file=DB_FILE):
-    with sqlite3.connect(DB_FILE) as conn:
+    with sqlite3.connect(db_file) as conn:
+        enable_wal(conn)
         cursor = conn.cursor()
 
         # Create players table
@@ -39,6 +130,20 @@ def create_general_tables(db_file=DB_FILE):
             )
         """)
 
+        # Create skins table. Tracks when each skin was last checked, and the HTTP validators
+        # from that fetch, so unchanged skins aren't downloaded again. The images are added by `_add_skin_images()`.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS skins (
+                uuid TEXT NOT NULL,
+                type TEXT NOT NULL,                 -- 'body' or 'face'
+                etag TEXT,
+                last_modified TEXT,                -- `Last-Modified` header, sent back as `If-Modified-Since`
+                content_hash TEXT,                 -- sha256 of the image
+                last_checked INTEGER NOT NULL,
+                PRIMARY KEY (uuid, type)
+            )
+        """)
+
         # Create misc. variables table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS variables (
@@ -49,25 +154,416 @@ def create_general_tables(db_file=DB_FILE):
 
         conn.commit()
 
+        # Everything added after the tables above is a migration
+        applied = migrate_general_db(conn)
+        if applied:
+            print(f"Applied {applied} migrations to the general database")
+
     print("General database initialized")
 
 
+# Migrations for atlascivs.db
+def _dedup_kills(cursor):
+    # Two kills can share a timestamp, so kills are deduplicated on this instead.
+    # Also covers the `MAX(timestamp)` lookups. Drop any duplicates first, or the index can't be created.
+    cursor.execute("""
+        DELETE FROM kills
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM kills GROUP BY timestamp, killer_uuid, victim_uuid
+        )
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX kills_dedup ON kills (timestamp, killer_uuid, victim_uuid)
+    """)
+
+
+def _add_players_updated_at(cursor):
+    # When the row last changed in ms, for `/api/players?since=`
+    cursor.execute("ALTER TABLE players ADD COLUMN updated_at INTEGER NOT NULL DEFAULT 0")
+
+    # Tombstones, so clients asking for changes since a version also hear about removed players
+    cursor.execute("""
+        CREATE TABLE deleted_players (
+            uuid TEXT PRIMARY KEY,
+            deleted_at INTEGER NOT NULL         -- ms, compared against `players.updated_at`
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER players_tombstone AFTER DELETE ON players
+        BEGIN
+            INSERT OR REPLACE INTO deleted_players (uuid, deleted_at)
+            VALUES (old.uuid, CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER players_untombstone AFTER INSERT ON players
+        BEGIN
+            DELETE FROM deleted_players WHERE uuid = new.uuid;
+        END
+    """)
+
+
+def _add_hot_query_indexes(cursor):
+    # Active player count (`last_online >= ?`)
+    cursor.execute("CREATE INDEX players_last_online ON players (last_online)")
+    # Online player count. Partial, so it only holds the handful of players online right now
+    cursor.execute("CREATE INDEX players_online ON players (online_duration) WHERE online_duration > 0")
+    # `/api/players?since=`
+    cursor.execute("CREATE INDEX players_updated_at ON players (updated_at)")
+    # Unique killer/victim counts, and per player kill lookups
+    cursor.execute("CREATE INDEX kills_killer ON kills (killer_uuid)")
+    cursor.execute("CREATE INDEX kills_victim ON kills (victim_uuid)")
+
+
+# What a kill is tallied under in `weapon_kill_counts`. Bad JSON would abort the insert, so check it first
+KILL_WEAPON_SQL = """
+    COALESCE(CASE WHEN json_valid({row}.weapon_json) THEN json_extract({row}.weapon_json, '$.type') END, 'none')
+"""
+
+
+def _add_kill_aggregates(cursor):
+    # Kept up to date by triggers on `kills`, in the same transaction as the insert,
+    # so `/api/kills_misc` and the kills leaderboard never have to go through every kill
+    cursor.execute("""
+        CREATE TABLE kill_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),  -- Only ever one row
+            total_kills INTEGER NOT NULL,
+            unique_killers INTEGER NOT NULL,
+            unique_victims INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE player_kill_counts (
+            uuid TEXT PRIMARY KEY,
+            kills INTEGER NOT NULL,
+            deaths INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE weapon_kill_counts (
+            weapon TEXT PRIMARY KEY,            -- Item type, e.g. `diamond_sword`. `none` if there wasn't one
+            kills INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX player_kill_counts_kills ON player_kill_counts (kills DESC)")
+    cursor.execute("CREATE INDEX player_kill_counts_deaths ON player_kill_counts (deaths DESC)")
+
+    # Counts from the kills already in the DB
+    cursor.execute("""
+        INSERT INTO player_kill_counts (uuid, kills, deaths)
+        SELECT uuid, SUM(kills), SUM(deaths)
+        FROM (
+            SELECT killer_uuid AS uuid, 1 AS kills, 0 AS deaths FROM kills
+            UNION ALL
+            SELECT victim_uuid, 0, 1 FROM kills
+        )
+        GROUP BY uuid
+    """)
+    cursor.execute(f"""
+        INSERT INTO weapon_kill_counts (weapon, kills)
+        SELECT {KILL_WEAPON_SQL.format(row="kills")}, COUNT(*) FROM kills GROUP BY 1
+    """)
+    cursor.execute("""
+        INSERT INTO kill_totals (id, total_kills, unique_killers, unique_victims)
+        SELECT 1,
+               (SELECT COUNT(*) FROM kills),
+               (SELECT COUNT(*) FROM player_kill_counts WHERE kills > 0),
+               (SELECT COUNT(*) FROM player_kill_counts WHERE deaths > 0)
+    """)
+
+    # Totals first, as whether they're a new killer/victim depends on the counts before this kill
+    cursor.execute(f"""
+        CREATE TRIGGER kills_aggregate_insert AFTER INSERT ON kills
+        BEGIN
+            UPDATE kill_totals SET
+                total_kills = total_kills + 1,
+                unique_killers = unique_killers + NOT EXISTS (
+                    SELECT 1 FROM player_kill_counts WHERE uuid = new.killer_uuid AND kills > 0
+                ),
+                unique_victims = unique_victims + NOT EXISTS (
+                    SELECT 1 FROM player_kill_counts WHERE uuid = new.victim_uuid AND deaths > 0
+                );
+
+            INSERT INTO player_kill_counts (uuid, kills, deaths) VALUES (new.killer_uuid, 1, 0)
+            ON CONFLICT(uuid) DO UPDATE SET kills = kills + 1;
+
+            INSERT INTO player_kill_counts (uuid, kills, deaths) VALUES (new.victim_uuid, 0, 1)
+            ON CONFLICT(uuid) DO UPDATE SET deaths = deaths + 1;
+
+            INSERT INTO weapon_kill_counts (weapon, kills) VALUES ({KILL_WEAPON_SQL.format(row="new")}, 1)
+            ON CONFLICT(weapon) DO UPDATE SET kills = kills + 1;
+        END
+    """)
+
+    # Kills are hardly ever deleted, but the counts shouldn't drift if they are
+    cursor.execute(f"""
+        CREATE TRIGGER kills_aggregate_delete AFTER DELETE ON kills
+        BEGIN
+            UPDATE player_kill_counts SET kills = kills - 1 WHERE uuid = old.killer_uuid;
+            UPDATE player_kill_counts SET deaths = deaths - 1 WHERE uuid = old.victim_uuid;
+            UPDATE weapon_kill_counts SET kills = kills - 1 WHERE weapon = {KILL_WEAPON_SQL.format(row="old")};
+
+            UPDATE kill_totals SET
+                total_kills = total_kills - 1,
+                unique_killers = unique_killers - EXISTS (
+                    SELECT 1 FROM player_kill_counts WHERE uuid = old.killer_uuid AND kills = 0
+                ),
+                unique_victims = unique_victims - EXISTS (
+                    SELECT 1 FROM player_kill_counts WHERE uuid = old.victim_uuid AND deaths = 0
+                );
+        END
+    """)
+
+
+def _add_skin_images(cursor):
+    # The images live in the DB now, so the webserver can load them all at once instead of a file per request
+    cursor.execute("ALTER TABLE skins ADD COLUMN image BLOB")
+    cursor.execute("ALTER TABLE skins ADD COLUMN changed_at INTEGER NOT NULL DEFAULT 0")    # When `image` last changed, in ms
+    cursor.execute("CREATE INDEX skins_changed_at ON skins (changed_at)")
+
+    # Bring over the files from before. Skins without a row get `last_checked = 0`, so they are refetched next run
+    now = int(time.time() * 1000)
+    for type, skins_dir in (("body", OLD_BODY_SKINS_DIR), ("face", OLD_FACE_SKINS_DIR)):
+        if not os.path.isdir(skins_dir):
+            continue
+
+        for file_name in os.listdir(skins_dir):
+            if not file_name.endswith(".png"):
+                continue
+
+            with open(os.path.join(skins_dir, file_name), "rb") as skin_file:
+                image = skin_file.read()
+
+            cursor.execute("""
+                INSERT INTO skins (uuid, type, content_hash, last_checked, image, changed_at)
+                VALUES (?, ?, ?, 0, ?, ?)
+                ON CONFLICT(uuid, type) DO UPDATE SET
+                    content_hash = excluded.content_hash, image = excluded.image, changed_at = excluded.changed_at
+            """, (file_name[:-len(".png")], type, hashlib.sha256(image).hexdigest(), image, now))
+
+    cursor.execute("""
+        INSERT INTO variables (variable, value) VALUES ('last_skins_update', ?)
+        ON CONFLICT(variable) DO UPDATE SET value = excluded.value
+    """, (str(now),))
+
+
+def _add_face_atlas(cursor):
+    # Every face packed into one image, rebuilt by the updater after each face skin run. See `face_atlas.py`
+    cursor.execute("""
+        CREATE TABLE face_atlas (
+            id INTEGER PRIMARY KEY CHECK (id = 1),  -- Only ever one row
+            version INTEGER NOT NULL,               -- Newest `skins.changed_at` of the faces in it
+            image BLOB NOT NULL,                    -- PNG
+            offsets TEXT NOT NULL                   -- JSON offset map
+        )
+    """)
+
+
+# Applied in order, `PRAGMA user_version` is how many have run. Only ever add to the end.
+GENERAL_MIGRATIONS = [
+    _dedup_kills,
+    _add_players_updated_at,
+    _add_hot_query_indexes,
+    _add_kill_aggregates,
+    _add_skin_images,
+    _add_face_atlas,
+]
+
+
+def migrate_general_db(conn) -> int:
+    """
+    Applies any migrations the DB hasn't had yet, each in its own transaction along with the version bump.
+    Runs `ANALYZE` afterwards so the query planner knows about the new indexes.
+
+    Returns how many migrations were applied.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    pending = GENERAL_MIGRATIONS[version:]
+
+    for number, migration in enumerate(pending, start=version + 1):
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    if pending:
+        conn.execute("ANALYZE")
+
+    return len(pending)
+
+
+# Queries run often enough that they should never scan a whole table. Checked by `check_query_plans()`.
+HOT_QUERIES = {
+    "status_online_count": ("SELECT COUNT(*) FROM players WHERE online_duration > 0", ()),
+    "players_misc_active": ("SELECT COUNT(*) FROM players WHERE last_online >= ?", (0,)),
+    "players_since": ("SELECT uuid FROM players WHERE updated_at > ?", (0,)),
+    "kills_leaderboard_kills": ("SELECT uuid FROM player_kill_counts WHERE kills > 0 ORDER BY kills DESC LIMIT 100", ()),
+    "kills_leaderboard_deaths": ("SELECT uuid FROM player_kill_counts WHERE deaths > 0 ORDER BY deaths DESC LIMIT 100", ()),
+    "kills_cursor": ("SELECT MAX(timestamp) FROM kills", ()),
+    "kill_history_newer": ("SELECT id FROM kills WHERE id > ? ORDER BY id ASC LIMIT 50", (0,)),
+    "kill_history_older": ("SELECT id FROM kills WHERE id < ? ORDER BY id DESC LIMIT 100", (0,)),
+    "kill_history_killer": ("SELECT id FROM kills WHERE killer_uuid = ? AND id < ? ORDER BY id DESC LIMIT 100", ("", 0)),
+    "kill_history_victim": ("SELECT id FROM kills WHERE victim_uuid = ? AND id < ? ORDER BY id DESC LIMIT 100", ("", 0)),
+    "skins_changed": ("SELECT uuid FROM skins WHERE changed_at > ?", (0,)),
+}
+
+
+def check_query_plans(db_file=DB_FILE) -> list:
+    """
+    Runs `EXPLAIN QUERY PLAN` on every query in `HOT_QUERIES`.
+    Returns `(name, plan step)` for each one that scans a table without an index, so an empty list means all good.
+    """
+    full_scans = []
+
+    with sqlite3.connect(db_file) as conn:
+        for name, (query, params) in HOT_QUERIES.items():
+            for _, _, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall():
+                # e.g. `SCAN players`, rather than `SCAN players USING COVERING INDEX ...` or `SEARCH ...`
+                if detail.startswith("SCAN ") and " USING " not in detail:
+                    full_scans.append((name, detail))
+
+    return full_scans
+
+
+def _create_stat_history_tables(cursor):
+    # Stat history. Only changes are recorded, see `stat_history.py` for the rollups and retention.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stat_history (
+            player_id INTEGER NOT NULL,
+            stat_key_id INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,        -- When the change was seen, in ms
+            stat_value INTEGER NOT NULL,       -- Value after the change
+            delta INTEGER NOT NULL,            -- Change from the previous value
+            PRIMARY KEY (player_id, stat_key_id, timestamp)
+        ) WITHOUT ROWID
+    """)
+
+    for table in ("stat_history_hourly", "stat_history_daily"):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                player_id INTEGER NOT NULL,
+                stat_key_id INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,           -- Start of the bucket, in ms
+                stat_value INTEGER NOT NULL,       -- Value at the end of the bucket
+                delta INTEGER NOT NULL,            -- Total change during the bucket
+                PRIMARY KEY (player_id, stat_key_id, bucket)
+            ) WITHOUT ROWID
+        """)
+
+    # For the retention DELETEs
+    cursor.execute("CREATE INDEX IF NOT EXISTS stat_history_timestamp ON stat_history (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS stat_history_hourly_bucket ON stat_history_hourly (bucket)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS stat_history_daily_bucket ON stat_history_daily (bucket)")
+
+
+def _is_table(cursor, name):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+def migrate_stats_to_normalized(cursor):
+    """
+    Moves stats from the old text keyed `player_statistics` table into the integer keyed ones.
+    Every row used to repeat the player UUID, category and stat key (in the table and again in its index),
+    now those are stored once in `stat_players` and `stat_keys`.
+
+    Safe to run on an already migrated database, it does nothing.
+    Returns `True` if anything was migrated.
+    """
+    if not _is_table(cursor, "player_statistics"):
+        return False
+
+    cursor.execute("""
+        INSERT OR IGNORE INTO stat_players (uuid)
+        SELECT DISTINCT player_uuid FROM player_statistics
+    """)
+    cursor.execute("""
+        INSERT OR IGNORE INTO stat_keys (category, stat_key)
+        SELECT DISTINCT category, stat_key FROM player_statistics
+    """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO player_stats (player_id, stat_key_id, stat_value)
+        SELECT stat_players.id, stat_keys.id, player_statistics.stat_value
+        FROM player_statistics
+        JOIN stat_players ON stat_players.uuid = player_statistics.player_uuid
+        JOIN stat_keys ON stat_keys.category = player_statistics.category AND stat_keys.stat_key = player_statistics.stat_key
+    """)
+    cursor.execute("DROP TABLE player_statistics")
+
+    return True
+
+
 def create_stats_tables(db_file=STATS_DB_FILE):
-    with sqlite3.connect(STATS_DB_FILE) as conn:
+    with sqlite3.connect(db_file) as conn:
+        enable_wal(conn)
         cursor = conn.cursor()
 
+        # Stats are stored by integer ID, the UUIDs and stat names are only stored once
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS player_statistics (
-                player_uuid TEXT NOT NULL,         -- UUID of the player
+            CREATE TABLE IF NOT EXISTS stat_players (
+                id INTEGER PRIMARY KEY,
+                uuid TEXT NOT NULL UNIQUE          -- UUID of the player
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stat_keys (
+                id INTEGER PRIMARY KEY,
                 category TEXT NOT NULL,            -- Category of the statistic (e.g., 'general', 'mob', 'item')
                 stat_key TEXT NOT NULL,            -- The name of the statistic (e.g., 'DAMAGE_DEALT', 'KILL_ENTITY:FROG')
+                UNIQUE (category, stat_key)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS player_stats (
+                player_id INTEGER NOT NULL,        -- stat_players.id
+                stat_key_id INTEGER NOT NULL,      -- stat_keys.id
                 stat_value INTEGER NOT NULL,       -- The value of the statistic
-                PRIMARY KEY (player_uuid, category, stat_key)
+                PRIMARY KEY (player_id, stat_key_id)
+            ) WITHOUT ROWID
+        """)
+
+        # Leaderboards are a range scan of this, already in order
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS player_stats_leaderboard ON player_stats (stat_key_id, stat_value DESC)
+        """)
+
+        # Ranked leaderboards, rebuilt by the stats updater. See `leaderboards.py`
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS leaderboards (
+                kind TEXT NOT NULL,                -- 'general' or 'custom'
+                stat TEXT NOT NULL,                -- Key in AVAILABLE_GENERAL_STATS or AVAILABLE_CUSTOM_STATS
+                version INTEGER NOT NULL,          -- Bumped every time the leaderboard changes
+                updated INTEGER NOT NULL,          -- Time of the last change in ms
+                json TEXT NOT NULL,                -- The API response, ready to send
+                PRIMARY KEY (kind, stat)
             )
         """)
 
+        _create_stat_history_tables(cursor)
+        migrated = migrate_stats_to_normalized(cursor)
+
+        # The old table as a read only view, for poking around the DB by hand
+        cursor.execute("""
+            CREATE VIEW IF NOT EXISTS player_statistics AS
+            SELECT stat_players.uuid AS player_uuid, stat_keys.category, stat_keys.stat_key, player_stats.stat_value
+            FROM player_stats
+            JOIN stat_players ON stat_players.id = player_stats.player_id
+            JOIN stat_keys ON stat_keys.id = player_stats.stat_key_id
+        """)
+
         conn.commit()
 
+        if migrated:
+            conn.execute("VACUUM")  # Actually give the space from the old tables back
+            print("Migrated stats database to integer keys")
+
     print("Stats database initialized")
 
 
@@ -96,9 +592,11 @@ def get_stat(player_uuid, category, stat_key):
         cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT stat_value
-            FROM player_statistics
-            WHERE player_uuid = ? AND category = ? AND stat_key = ?
+            SELECT player_stats.stat_value
+            FROM player_stats
+            JOIN stat_players ON stat_players.id = player_stats.player_id
+            JOIN stat_keys ON stat_keys.id = player_stats.stat_key_id
+            WHERE stat_players.uuid = ? AND stat_keys.category = ? AND stat_keys.stat_key = ?
         """, (player_uuid, category, stat_key))
 
         result = cursor.fetchone()
@@ -131,4 +629,11 @@ if __name__ == "__main__":
     create_general_tables()
     create_stats_tables()
 
+    # Fails if an index stopped being used, e.g. after a query or schema change
+    full_scans = check_query_plans()
+    for name, detail in full_scans:
+        print(f"Hot query `{name}` does a full table scan: {detail}")
+    if full_scans:
+        sys.exit(1)
+
     pass
\ No newline at end of file
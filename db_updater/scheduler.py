@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ScheduledTask:
+    """
+    A blocking function that the scheduler runs every `interval` seconds.
+
+    `param name` Name used in logs and stats.
+    `param func` Blocking callable that takes no arguments. Runs in a worker thread.
+    `param interval` Seconds between the start of each run.
+    `param timeout` Seconds before a run is reported as timed out and counted as a failure.
+    `param warn_after` Seconds a run can take before it is logged as slow. Runs include any network requests,
+    so this should leave room for a slow API.
+    `param max_backoff` Upper limit in seconds for the delay after repeated failures.
+    """
+
+    def __init__(self, name, func, interval, timeout=30, warn_after=5, max_backoff=300):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.timeout = timeout
+        self.warn_after = warn_after
+        self.max_backoff = max_backoff
+
+        # Stats
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.timeouts = 0
+        self.overruns = 0       # Runs that took longer than the task's interval
+        self.slow_runs = 0      # Runs that took longer than `warn_after`
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+
+    def next_delay(self, duration) -> float:
+        """
+        Seconds to wait before the next run. Backs off exponentially while the task is failing.
+        """
+        if self.consecutive_failures:
+            return min(self.interval * 2 ** self.consecutive_failures, self.max_backoff)
+
+        return max(self.interval - duration, 0)
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "overruns": self.overruns,
+            "slow_runs": self.slow_runs,
+            "last_ms": round(self.last_duration * 1000, 2),
+            "max_ms": round(self.max_duration * 1000, 2),
+            "avg_ms": round(self.total_duration / self.runs * 1000, 2) if self.runs else 0
+        }
+
+
+class Scheduler:
+    """
+    Runs each registered task on its own interval, so a slow task (like the skin CDNs)
+    can't hold up the frequent ones (like the kill feed).
+
+    `param log` Logger to report failures and slow runs to.
+    `param quiet_errors` Exceptions that just mean the API is down for a bit. These are logged
+    at INFO without a traceback, and backed off like any other failure.
+    `param stats_interval` Seconds between logging each task's stats.
+    """
+
+    def __init__(self, log: logging.Logger, quiet_errors=(), stats_interval=600):
+        self.log = log
+        self.quiet_errors = tuple(quiet_errors)
+        self.stats_interval = stats_interval
+        self.tasks = []
+
+    def add_task(self, name, func, interval, **kwargs) -> ScheduledTask:
+        task = ScheduledTask(name, func, interval, **kwargs)
+        self.tasks.append(task)
+
+        return task
+
+    async def _run_task(self, task: ScheduledTask, executor: ThreadPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            start_time = time.monotonic()
+            future = loop.run_in_executor(executor, task.func)
+
+            try:
+                await asyncio.wait_for(asyncio.shield(future), task.timeout)
+                task.consecutive_failures = 0
+            except asyncio.TimeoutError:
+                task.failures += 1
+                task.timeouts += 1
+                task.consecutive_failures += 1
+                self.log.warning(f"Task `{task.name}` timed out after {task.timeout}s")
+
+                # The thread can't be killed, so wait it out rather than running two copies at once
+                try:
+                    await future
+                except Exception:
+                    pass
+            except self.quiet_errors as e:
+                # Probably just the server restarting, so no traceback
+                task.failures += 1
+                task.consecutive_failures += 1
+                self.log.info(f"Task `{task.name}` could not reach the API: {e}")
+            except Exception:
+                task.failures += 1
+                task.consecutive_failures += 1
+                self.log.error(f"Task `{task.name}` failed: {traceback.format_exc()}")
+
+            duration = time.monotonic() - start_time
+            task.runs += 1
+            task.last_duration = duration
+            task.total_duration += duration
+            task.max_duration = max(task.max_duration, duration)
+
+            # Overruns are only counted, a slow API response alone can make a 2s task overrun
+            if duration > task.interval:
+                task.overruns += 1
+            if duration > task.warn_after:
+                task.slow_runs += 1
+                self.log.warning(f"Task `{task.name}` took {round(duration * 1000, 2)}ms (limit {task.warn_after * 1000}ms)")
+
+            await asyncio.sleep(task.next_delay(duration))
+
+    async def _report_stats(self) -> None:
+        while True:
+            await asyncio.sleep(self.stats_interval)
+
+            for task in self.tasks:
+                self.log.info(f"Task `{task.name}` stats: {task.stats()}")
+
+    async def _main(self) -> None:
+        # One thread per task, so a stuck task never takes a thread from another one
+        with ThreadPoolExecutor(max_workers=len(self.tasks), thread_name_prefix="task") as executor:
+            await asyncio.gather(
+                self._report_stats(),
+                *(self._run_task(task, executor) for task in self.tasks)
+            )
+
+    def run(self) -> None:
+        """
+        Runs the scheduler forever.
+        """
+        asyncio.run(self._main())
@@ -7,19 +7,41 @@ import sys
 import traceback
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 # Python not looking in parent directories for common files you might want to use is stupid
 sys.path.append("../")
 from diet_logger import setup_logger
+from db_utils import create_stats_tables, configure_connection, run_maintenance, format_maintenance
+from stat_history import record_history, rollup_history
+from leaderboards import materialize_leaderboards
 
 
 LOG_LEVEL = logging.INFO
 LOG_FILE = "../logs/stats_updater.log"
 DB_FILE = "../db/atlas_stats.db"
+ATLAS_DB_FILE = "../db/atlascivs.db"     # Attached for player names in the leaderboards
 API_URL = "https://ip1.realwizardhosting.online:7070/api"
-    
+
+UPDATE_INTERVAL = 15            # Seconds between the start of each cycle
+ROLLUP_INTERVAL = 60 * 60       # Seconds between stat history rollups
+MAINTENANCE_INTERVAL = 60 * 60  # Seconds between WAL checkpoints and vacuums, see `run_maintenance()`
+LEADERBOARD_MAX_AGE = 5 * 60    # Seconds before leaderboards are rebuilt even if no stats changed, to pick up renamed players
+STATS_FETCH_CONCURRENCY = 8     # Max number of `/full_player_stats` requests in flight at once
+
+# Keep-alive connections to AC-API, shared by the fetching threads
+http_session = requests.Session()
+http_session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=STATS_FETCH_CONCURRENCY))
+
+# Last written value of every stat, keyed by player UUID then `(category, stat_key)`.
+# Lets each cycle only write the stats that actually changed.
+stats_snapshot = {}
+
+# Cached `stat_players` and `stat_keys` IDs, so rows can be written by ID without looking them up each cycle
+player_ids = {}
+stat_key_ids = {}
 
 
 class BadGatewayError(Exception):
@@ -30,39 +52,159 @@ class BadGatewayError(Exception):
 
 def get_all_stats(player_uuid):
     with sqlite3.connect(DB_FILE) as conn:
+        configure_connection(conn)
         cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT category, stat_key, stat_value
-            FROM player_statistics
-            WHERE player_uuid = ?
+            SELECT stat_keys.category, stat_keys.stat_key, player_stats.stat_value
+            FROM player_stats
+            JOIN stat_players ON stat_players.id = player_stats.player_id
+            JOIN stat_keys ON stat_keys.id = player_stats.stat_key_id
+            WHERE stat_players.uuid = ?
         """, (player_uuid,))
 
         return cursor.fetchall()
 
 
-def insert_statistics(player_uuid, stats_json):
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        
-        for category, stats in stats_json.items():
-            if isinstance(stats, dict):
-                for key, value in stats.items():
-                    if isinstance(value, dict):  # Handle nested keys
-                        for sub_key, sub_value in value.items():
-                            stat_key = f"{key}:{sub_key}"
-                            cursor.execute("""
-                                INSERT INTO player_statistics (player_uuid, category, stat_key, stat_value)
-                                VALUES (?, ?, ?, ?)
-                                ON CONFLICT(player_uuid, category, stat_key) DO UPDATE SET stat_value = excluded.stat_value
-                            """, (player_uuid, category, stat_key, sub_value))
-                    else:  # Flat key-value pairs
-                        cursor.execute("""
-                            INSERT INTO player_statistics (player_uuid, category, stat_key, stat_value)
-                            VALUES (?, ?, ?, ?)
-                            ON CONFLICT(player_uuid, category, stat_key) DO UPDATE SET stat_value = excluded.stat_value
-                        """, (player_uuid, category, key, value))
-        conn.commit()
+def get_player_id(cursor, player_uuid) -> int:
+    """
+    Returns the `stat_players` ID for a UUID, adding the player if they're new.
+    """
+    if player_uuid not in player_ids:
+        cursor.execute("INSERT OR IGNORE INTO stat_players (uuid) VALUES (?)", (player_uuid,))
+        cursor.execute("SELECT id FROM stat_players WHERE uuid = ?", (player_uuid,))
+        player_ids[player_uuid] = cursor.fetchone()[0]
+
+    return player_ids[player_uuid]
+
+
+def get_stat_key_id(cursor, category, stat_key) -> int:
+    """
+    Returns the `stat_keys` ID for a stat, adding the stat if it's new.
+    """
+    if (category, stat_key) not in stat_key_ids:
+        cursor.execute("INSERT OR IGNORE INTO stat_keys (category, stat_key) VALUES (?, ?)", (category, stat_key))
+        cursor.execute("SELECT id FROM stat_keys WHERE category = ? AND stat_key = ?", (category, stat_key))
+        stat_key_ids[(category, stat_key)] = cursor.fetchone()[0]
+
+    return stat_key_ids[(category, stat_key)]
+
+
+def flatten_stats(stats_json):
+    """
+    Flattens the `/full_player_stats` response into `(category, stat_key, stat_value)` rows.
+    Nested stats are keyed as `KEY:SUB_KEY`, e.g. `KILL_ENTITY:FROG`.
+    """
+    for category, stats in stats_json.items():
+        if isinstance(stats, dict):
+            for key, value in stats.items():
+                if isinstance(value, dict):  # Handle nested keys
+                    for sub_key, sub_value in value.items():
+                        yield category, f"{key}:{sub_key}", sub_value
+                else:  # Flat key-value pairs
+                    yield category, key, value
+
+
+def diff_statistics(player_stats: dict):
+    """
+    Compares this cycle's stats against `stats_snapshot`, as almost all of them are unchanged between cycles.
+    Players not in the snapshot yet are loaded from the DB first.
+
+    `param player_stats` Dict of player UUID to their `/full_player_stats` response.
+    Returns the changed `(player_uuid, category, stat_key, stat_value)` rows, and how many rows were skipped.
+    """
+    changed_rows = []
+    skipped = 0
+
+    for player_uuid, stats_json in player_stats.items():
+        if player_uuid not in stats_snapshot:
+            stats_snapshot[player_uuid] = {
+                (category, stat_key): stat_value for category, stat_key, stat_value in get_all_stats(player_uuid)
+            }
+        snapshot = stats_snapshot[player_uuid]
+
+        for category, stat_key, stat_value in flatten_stats(stats_json):
+            if snapshot.get((category, stat_key)) == stat_value:
+                skipped += 1
+            else:
+                changed_rows.append((player_uuid, category, stat_key, stat_value))
+
+    return changed_rows, skipped
+
+
+def insert_statistics(cursor, rows: list) -> None:
+    """
+    Upserts `(player_id, stat_key_id, stat_value)` rows.
+    """
+    cursor.executemany("""
+        INSERT INTO player_stats (player_id, stat_key_id, stat_value)
+        VALUES (?, ?, ?)
+        ON CONFLICT(player_id, stat_key_id) DO UPDATE SET stat_value = excluded.stat_value
+    """, rows)
+
+
+def fetch_player_stats(uuid, name):
+    """
+    Returns the `/full_player_stats` response for a player, or `None` if it couldn't be fetched.
+    """
+    stats_response = http_session.get(f"{API_URL}/full_player_stats/{uuid}", timeout=20)
+
+    if stats_response.status_code == 200:
+        log.debug(f"Fetched player stats for {name} ({uuid})")
+        return stats_response.json()
+    elif stats_response.status_code == 404:   # Player logged out before we could fetch stats. This is fine.
+        log.info(f"Attempted to fetch stats for {uuid} who is now offline. Skipping.")
+    else:
+        log.warning(f"Failed to fetch stats for {uuid}. HTTP {stats_response.status_code}")
+
+    return None
+
+
+def update_stats(conn, executor) -> tuple:
+    """
+    Fetches the stats of every online player in parallel, then writes the ones that changed in one transaction.
+    Returns how many stat rows were changed and skipped.
+    """
+    response = http_session.get(API_URL + "/online_players", timeout=20)
+    if response.status_code == 200:
+        online_players = response.json().get("online_players", {})
+
+        futures = {
+            uuid: executor.submit(fetch_player_stats, uuid, player_data.get("name"))
+            for uuid, player_data in online_players.items()
+        }
+        player_stats = {uuid: future.result() for uuid, future in futures.items()}
+        player_stats = {uuid: stats_json for uuid, stats_json in player_stats.items() if stats_json is not None}
+
+        changed_rows, skipped = diff_statistics(player_stats)
+
+        with conn:  # One commit for every player's stats
+            cursor = conn.cursor()
+
+            # `(player_id, stat_key_id, stat_value, delta)`
+            id_rows = [
+                (
+                    get_player_id(cursor, player_uuid), get_stat_key_id(cursor, category, stat_key),
+                    stat_value, stat_value - stats_snapshot[player_uuid].get((category, stat_key), 0)
+                )
+                for player_uuid, category, stat_key, stat_value in changed_rows
+            ]
+
+            insert_statistics(cursor, [(player_id, stat_key_id, stat_value) for player_id, stat_key_id, stat_value, _ in id_rows])
+            record_history(cursor, id_rows, int(time.time() * 1000))
+
+        # Only once the commit went through, so a failed write is retried next cycle
+        for player_uuid, category, stat_key, stat_value in changed_rows:
+            stats_snapshot[player_uuid][(category, stat_key)] = stat_value
+
+        log.debug(f"Updated stats for {len(player_stats)} players")
+        return len(changed_rows), skipped
+    elif response.status_code == 502:
+        raise BadGatewayError("API server returned 502 Bad Gateway. Is server offline or restarting?")
+    else:
+        log.warning(f"Failed to fetch online players. HTTP {response.status_code}")
+
+    return 0, 0
 
 
 # TODO: 
@@ -74,35 +216,42 @@ if __name__ == "__main__":  # autism
         log = setup_logger(LOG_FILE, LOG_LEVEL)
         log.info("---- Starting Stats Updater ----")
 
+        create_stats_tables()
+        conn = sqlite3.connect(DB_FILE)
+        configure_connection(conn)
+        conn.execute("ATTACH DATABASE ? AS atlas", (ATLAS_DB_FILE,))
+        executor = ThreadPoolExecutor(max_workers=STATS_FETCH_CONCURRENCY, thread_name_prefix="stats")
+        last_rollup = 0
+        last_leaderboards = 0
+        last_maintenance = time.time()  # Not straight away, as the script restarts itself after errors
+
         while True: 
             start_time = time.time()
 
-            response = requests.get(API_URL + "/online_players")
-            if response.status_code == 200:
-                data = response.json()
-                online_players = data.get("online_players", {})
-
-                for uuid, player_data in online_players.items():
-                    stats_url = f"{API_URL}/full_player_stats/{uuid}"
-                    stats_response = requests.get(stats_url, timeout=20)
-
-                    if stats_response.status_code == 200:
-                        stats_json = stats_response.json()
-                        insert_statistics(uuid, stats_json)
-                        log.debug(f"Updated player stats for {player_data['name']} ({uuid})")
-                    elif response.status_code == 404:   # Player logged out before we could fetch stats. This is fine.
-                        log.info(f"Attempted to fetch stats for {uuid} who is now offline. Skipping.")
-                    else:
-                        log.warning(f"Failed to fetch stats for {uuid}. HTTP {stats_response.status_code}")
-            elif response.status_code == 502:
-                raise BadGatewayError("API server returned 502 Bad Gateway. Is server offline or restarting?")
-            else:
-                log.warning(f"Failed to fetch online players. HTTP {response.status_code}")
+            changed, skipped = update_stats(conn, executor)
+
+            if start_time - last_rollup > ROLLUP_INTERVAL:
+                rollup_start = time.time()
+                with conn:
+                    dropped = rollup_history(conn.cursor())
+                log.info(f"Rolled up stat history in {round((time.time() - rollup_start) * 1000, 3)}ms, dropped {dropped}")
+                last_rollup = start_time
+
+            if changed or start_time - last_leaderboards > LEADERBOARD_MAX_AGE:
+                with conn:
+                    rebuilt = materialize_leaderboards(conn.cursor())
+                log.debug(f"Rebuilt {rebuilt} leaderboards")
+                last_leaderboards = start_time
+
+            if start_time - last_maintenance > MAINTENANCE_INTERVAL:
+                log.info(f"DB maintenance: {format_maintenance(run_maintenance(conn, DB_FILE))}")
+                last_maintenance = start_time
 
             end_time = time.time()  
             # Print to not fill log file
-            print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} Time to update stats DB was {round((end_time - start_time) * 1000, 3)}ms")
-            time.sleep(15)
+            print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} Time to update stats DB was {round((end_time - start_time) * 1000, 3)}ms "
+                  f"({changed} rows changed, {skipped} skipped)")
+            time.sleep(max(UPDATE_INTERVAL - (end_time - start_time), 0))
 
     # This generally isn't a thing anymore, as its now behind Cloudflare. CF will return 502 instead of this throwing an error.
     # This still happens on occasion however, so we still catch it.
@@ -0,0 +1,52 @@
+import io
+import math
+
+from PIL import Image
+
+# Shared by the updater (builds the atlas of every face after each face skin run) and the webserver
+# (builds atlases for just the requested players).
+#
+# Packs the 8x8 face skins into one PNG, so a page can show hundreds of faces with a single image request.
+# The offsets are in pixels of the unscaled atlas, see `renderLeaderboard()` in stats.js for scaling them.
+
+FACE_SIZE = 8
+MAX_COLUMNS = 32    # 256px wide, and about 8KB for 500 faces
+
+
+def build_face_atlas(faces) -> tuple:
+    """
+    `param faces` List of `(uuid, PNG bytes)`, in the order they should be laid out.
+
+    Returns `(PNG bytes, offset map)`. The map is `{"size", "width", "height", "faces": {uuid: [x, y]}}`.
+    Faces that can't be decoded are left out of both.
+    """
+    decoded = []
+    for uuid, image in faces:
+        try:
+            face = Image.open(io.BytesIO(image)).convert("RGBA")
+        except (OSError, ValueError):   # Sometimes the skin APIs send back garbage
+            continue
+
+        if face.size != (FACE_SIZE, FACE_SIZE):
+            face = face.resize((FACE_SIZE, FACE_SIZE), Image.NEAREST)
+        decoded.append((uuid, face))
+
+    columns = max(1, min(MAX_COLUMNS, len(decoded)))
+    rows = max(1, math.ceil(len(decoded) / columns))
+    atlas = Image.new("RGBA", (columns * FACE_SIZE, rows * FACE_SIZE), (0, 0, 0, 0))
+
+    offsets = {}
+    for index, (uuid, face) in enumerate(decoded):
+        x, y = (index % columns) * FACE_SIZE, (index // columns) * FACE_SIZE
+        atlas.paste(face, (x, y))
+        offsets[uuid] = [x, y]
+
+    buffer = io.BytesIO()
+    atlas.save(buffer, "PNG", optimize=True)
+
+    return buffer.getvalue(), {
+        "size": FACE_SIZE,
+        "width": atlas.width,
+        "height": atlas.height,
+        "faces": offsets
+    }
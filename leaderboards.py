@@ -0,0 +1,147 @@
+import json
+import time
+
+# Shared by the stats updater (builds the leaderboards) and the webserver (serves them).
+#
+# Every leaderboard is ranked once per stats update and stored in the `leaderboards` table as the
+# ready-to-serve JSON response, so the web routes never sort `player_stats` themselves.
+# Builders expect atlascivs.db to be attached as `atlas`, for player names.
+
+MAX_ENTRIES = 500   # Per leaderboard
+
+
+# Helper functions
+def count(count):
+    return int(count), "quantity"
+
+def ticks_to_hours(ticks):
+    return f"{ticks / 20 / 60 / 60:.1f}", "hours"
+
+def cm_to_km(cm):
+    return f"{cm / 100_000:.3f}", "kilometers"
+
+
+# General stats
+# This lists queryable stats, and what translation to use for the result. The comments are what appears in game.
+# Note that this is kind of goofy. You will call for a stat key, but the result will be translated into different units.
+AVAILABLE_GENERAL_STATS = {
+    # Key, (stat translation function)
+    "DEATHS": count,                        # Number of deaths
+    "TIME_SINCE_DEATH": ticks_to_hours,     # Time since last death
+    "PLAYER_KILLS": count,                  # Player kills
+    "TOTAL_WORLD_TIME": ticks_to_hours,     # Time played
+    "PIG_ONE_CM": cm_to_km,                 # Distance by pig
+    "ANIMALS_BRED": count,                  # Animals bred
+    "CAKE_SLICES_EATEN": count,             # Cake slices eaten
+    "CRAFTING_TABLE_INTERACTION": count,    # Interactions with crafting table
+    "TRADED_WITH_VILLAGER": count,          # Traded with villagers
+    "SLEEP_IN_BED": count,                  # Times slept in a bed
+    "FISH_CAUGHT": count                    # Fish caught
+}
+
+
+def build_general_leaderboard(cursor, stat: str) -> dict:
+    stat_translation = AVAILABLE_GENERAL_STATS[stat]
+
+    cursor.execute("""
+        SELECT stat_players.uuid, COALESCE(atlas.players.name, 'Unknown'), player_stats.stat_value
+        FROM player_stats
+        JOIN stat_players ON stat_players.id = player_stats.player_id
+        LEFT JOIN atlas.players ON atlas.players.uuid = stat_players.uuid
+        WHERE player_stats.stat_key_id = (
+            SELECT id FROM stat_keys WHERE category = 'general' AND stat_key = ?
+        )
+        ORDER BY player_stats.stat_value DESC
+        LIMIT ?
+    """, (stat, MAX_ENTRIES))
+
+    leaderboard = []
+    units = None
+    for player_uuid, player_name, stat_value in cursor.fetchall():
+        translated_value, stat_unit = stat_translation(stat_value)
+        units = stat_unit
+
+        leaderboard.append({
+            "uuid": player_uuid,
+            "name": player_name,
+            "value": translated_value
+        })
+
+    return {"units": units, "leaderboard": leaderboard}
+
+
+# Custom stats
+def get_playtime_death_ratio(cursor) -> list:
+    # If no deaths, ratio is just their playtime
+    cursor.execute("""
+        SELECT stat_players.uuid,
+               COALESCE(atlas.players.name, 'Unknown'),
+               CAST(p1.stat_value AS FLOAT) / MAX(COALESCE(p2.stat_value, 0), 1) AS ticks_per_death
+        FROM player_stats p1
+        JOIN stat_players ON stat_players.id = p1.player_id
+        LEFT JOIN atlas.players ON atlas.players.uuid = stat_players.uuid
+        LEFT JOIN player_stats p2
+            ON p1.player_id = p2.player_id
+            AND p2.stat_key_id = (SELECT id FROM stat_keys WHERE category = 'general' AND stat_key = 'DEATHS')
+        WHERE p1.stat_key_id = (SELECT id FROM stat_keys WHERE category = 'general' AND stat_key = 'TOTAL_WORLD_TIME')
+        ORDER BY ticks_per_death DESC
+    """)
+
+    return [
+        {
+            "uuid": player_uuid,
+            "name": player_name,
+            "value": f"{ticks_per_death / 20 / 60 / 60:.1f}"   # Convert ticks to hours
+        }
+        for player_uuid, player_name, ticks_per_death in cursor.fetchall()
+    ]
+
+
+AVAILABLE_CUSTOM_STATS = {
+    "PLAYTIME_DEATH_RATIO": (get_playtime_death_ratio, "avg. hours per death")
+}
+
+
+def build_custom_leaderboard(cursor, stat: str) -> dict:
+    stat_function, units = AVAILABLE_CUSTOM_STATS[stat]
+
+    return {"units": units, "leaderboard": stat_function(cursor)}
+
+
+def materialize_leaderboards(cursor) -> int:
+    """
+    Rebuilds every leaderboard, and stores the ones that changed.
+
+    Returns how many leaderboards changed.
+    """
+    cursor.execute("SELECT kind, stat, json FROM leaderboards")
+    stored = {(kind, stat): stored_json for kind, stat, stored_json in cursor.fetchall()}
+
+    builds = [("general", stat, build_general_leaderboard) for stat in AVAILABLE_GENERAL_STATS]
+    builds += [("custom", stat, build_custom_leaderboard) for stat in AVAILABLE_CUSTOM_STATS]
+
+    now = int(time.time() * 1000)
+    changed = 0
+    for kind, stat, builder in builds:
+        leaderboard_json = json.dumps(builder(cursor, stat), separators=(",", ":"))
+        if stored.get((kind, stat)) == leaderboard_json:
+            continue
+
+        cursor.execute("""
+            INSERT INTO leaderboards (kind, stat, version, updated, json)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT(kind, stat) DO UPDATE SET
+                version = version + 1, updated = excluded.updated, json = excluded.json
+        """, (kind, stat, now, leaderboard_json))
+        changed += 1
+
+    return changed
+
+
+def get_leaderboard(cursor, kind: str, stat: str) -> tuple:
+    """
+    Returns the stored `(version, json)` of a leaderboard, or `None` if it hasn't been built yet.
+    """
+    cursor.execute("SELECT version, json FROM leaderboards WHERE kind = ? AND stat = ?", (kind, stat))
+
+    return cursor.fetchone()
@@ -0,0 +1,253 @@
+import glob
+import hashlib
+import json
+import os
+
+from PIL import Image, ImageOps
+
+# Shared by the updater (processes the showcase images on a schedule) and the webserver (reads the results).
+#
+# Showcase photos are uploaded as is, often as multi MB PNGs straight from the game. This makes a WebP
+# thumbnail and a few widths of each for `srcset`, plus AVIF versions if this Pillow can encode them.
+# Pillow doesn't copy EXIF (or any other metadata) unless it's passed to `save()`, so the variants are stripped.
+#
+# The manifest is edited by hand, so the results go in their own index, `VARIANTS_INDEX`, rather than in it.
+# Variant file names include a hash of the original, so they can be cached for good.
+
+VARIANT_WIDTHS = (480, 960, 1440, 1920)
+THUMB_WIDTH = 240
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+
+VARIANTS_DIR = "variants"                       # In the showcase images dir
+VARIANTS_INDEX = "showcase_variants.json"       # Likewise. `{img_src: processed image}`, see `process_image()`
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", ".tiff")
+ORIENTATION_TAG = 0x0112   # EXIF
+
+Image.init()
+AVIF_SUPPORTED = ".avif" in Image.registered_extensions()
+
+
+def load_index(images_dir) -> dict:
+    try:
+        with open(os.path.join(images_dir, VARIANTS_INDEX), "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_index(images_dir, index: dict) -> None:
+    path = os.path.join(images_dir, VARIANTS_INDEX)
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(index, file, indent=4)
+
+    os.replace(f"{path}.tmp", path)     # The webserver never reads a half written index
+
+
+def _hash_file(path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+def _resize(image, width):
+    height = round(image.height * width / image.width)
+
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def process_image(source_path, out_dir, content_hash=None) -> dict:
+    """
+    Makes the thumbnail and width variants of one image, in `out_dir`.
+
+    `param content_hash` sha256 of the source, if it's already known.
+
+    Returns `{"hash", "width", "height", "thumb", "variants": [{"width", "webp", "avif"}]}`, smallest first,
+    where the file names are relative to `out_dir` and `avif` is only there if it's supported.
+    """
+    content_hash = content_hash or _hash_file(source_path)
+    stem = f"{os.path.splitext(os.path.basename(source_path))[0]}-{content_hash[:12]}"
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    with Image.open(source_path) as source:
+        image = ImageOps.exif_transpose(source)     # Bake in the rotation before the EXIF that says it is dropped
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+    def save(resized, name, format, quality):
+        # Temp file first, so a half written variant is never served
+        path = os.path.join(out_dir, name)
+        resized.save(f"{path}.tmp", format, quality=quality)
+        os.replace(f"{path}.tmp", path)
+
+    result = {"hash": content_hash, "width": image.width, "height": image.height, "variants": []}
+
+    result["thumb"] = f"{stem}-thumb.webp"
+    save(_resize(image, min(THUMB_WIDTH, image.width)), result["thumb"], "WEBP", WEBP_QUALITY)
+
+    # Never upscaled. Anything up to the largest width also gets one at its own width
+    widths = [width for width in VARIANT_WIDTHS if width < image.width]
+    if image.width <= VARIANT_WIDTHS[-1]:
+        widths.append(image.width)
+    for width in widths:
+        resized = _resize(image, width)
+        variant = {"width": width, "webp": f"{stem}-{width}w.webp"}
+        save(resized, variant["webp"], "WEBP", WEBP_QUALITY)
+
+        if AVIF_SUPPORTED:
+            variant["avif"] = f"{stem}-{width}w.avif"
+            save(resized, variant["avif"], "AVIF", AVIF_QUALITY)
+
+        result["variants"].append(variant)
+
+    return result
+
+
+def _variant_files(processed: dict) -> list:
+    if processed.get("failed"):
+        return []
+
+    files = [processed["thumb"]]
+    for variant in processed["variants"]:
+        files += [variant["webp"]] + ([variant["avif"]] if "avif" in variant else [])
+
+    return files
+
+
+def process_showcase(images_dir, log=None) -> int:
+    """
+    Processes every image in `images_dir` that is new or changed since it was last processed,
+    and cleans up the variants of images that were removed.
+
+    Returns how many images were processed.
+    """
+    index = load_index(images_dir)
+    out_dir = os.path.join(images_dir, VARIANTS_DIR)
+
+    images = {
+        entry.name: entry.stat()
+        for entry in os.scandir(images_dir)
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)
+    }
+
+    processed = 0
+    changed = False
+    for img_src, stat in images.items():
+        entry = index.get(img_src)
+        # Checked by size and mtime first, so unchanged images aren't read every run
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime_ns:
+            continue
+
+        source_path = os.path.join(images_dir, img_src)
+        content_hash = _hash_file(source_path)
+
+        if entry and entry.get("hash") == content_hash:    # Touched but not changed
+            entry.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+            changed = True
+            continue
+
+        try:
+            result = process_image(source_path, out_dir, content_hash)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            if log: log.warning(f"Couldn't process showcase image {img_src}, the original will be served instead")
+            # Not retried until the file changes
+            result = {"hash": content_hash, "failed": True}
+
+        if entry:
+            for file_name in set(_variant_files(entry)) - set(_variant_files(result)):
+                _remove(out_dir, file_name)
+
+        index[img_src] = {**result, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+        processed += not result.get("failed")
+        changed = True
+
+    for img_src in [img_src for img_src in index if img_src not in images]:
+        for file_name in _variant_files(index.pop(img_src)):
+            _remove(out_dir, file_name)
+        changed = True
+
+    if changed:
+        _save_index(images_dir, index)
+
+    return processed
+
+
+# Submissions
+# The webserver saves each one in its own folder with a `*-data.json` with `"status": "pending"`, and leaves the rest here.
+
+def _clean_submission(photo_path) -> tuple:
+    """
+    Checks the upload really is an image, and rewrites it without its metadata (uploads from phones can have GPS in the EXIF).
+    Returns the image's `(width, height)`.
+    """
+    with Image.open(photo_path) as source:
+        source.verify()     # Catches truncated and corrupt files without decoding the whole thing
+
+    with Image.open(photo_path) as source:
+        if getattr(source, "n_frames", 1) > 1:  # Animated, which would get flattened. Rare enough to leave as is
+            return source.size
+
+        format = source.format
+        options = {"icc_profile": source.info["icc_profile"]} if "icc_profile" in source.info else {}   # Colors, not EXIF
+
+        if source.getexif().get(ORIENTATION_TAG, 1) == 1:
+            image = source
+            if format == "JPEG":
+                options["quality"] = "keep"     # The original's quality, so cleaning it doesn't make it any worse
+        else:
+            image = ImageOps.exif_transpose(source)     # Bake in the rotation before the EXIF that says it is dropped
+
+        tmp_path = f"{photo_path}.tmp"
+        image.save(tmp_path, format, **options)
+        size = image.size
+
+    os.replace(tmp_path, photo_path)
+
+    return size
+
+
+def process_submissions(submissions_dir, log=None) -> int:
+    """
+    Cleans up every pending submission, and marks it `processed`, or `rejected` if it isn't an image.
+    Returns how many were processed.
+    """
+    processed = 0
+
+    for metadata_path in glob.glob(os.path.join(glob.escape(submissions_dir), "*", "*-data.json")):
+        try:
+            with open(metadata_path, "r") as file:
+                metadata = json.load(file)
+        except ValueError:  # Still being written
+            continue
+
+        if metadata.get("status") != "pending":
+            continue
+
+        photo_path = os.path.join(os.path.dirname(metadata_path), metadata["img_src"])
+        try:
+            metadata["width"], metadata["height"] = _clean_submission(photo_path)
+            # The webserver's were of the upload, which cleaning just rewrote
+            metadata["sha256"] = _hash_file(photo_path)
+            metadata["size"] = os.path.getsize(photo_path)
+            metadata["status"] = "processed"
+            processed += 1
+        except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:     # `verify()` raises SyntaxError for some broken files
+            if log: log.warning(f"Rejected showcase submission {metadata_path}: {e}")
+            metadata["status"] = "rejected"
+            metadata["error"] = str(e)
+
+        with open(f"{metadata_path}.tmp", "w") as file:
+            json.dump(metadata, file, indent=4)
+        os.replace(f"{metadata_path}.tmp", metadata_path)
+
+    return processed
+
+
+def _remove(out_dir, file_name) -> None:
+    try:
+        os.remove(os.path.join(out_dir, file_name))
+    except FileNotFoundError:
+        pass
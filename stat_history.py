@@ -0,0 +1,123 @@
+import time
+
+# Shared by the stats updater (writes and rolls up history) and the webserver (reads it).
+#
+# Every stat change is appended to `stat_history` as the new value and the delta from the last value.
+# Like `player_stats`, rows are keyed by `stat_players.id` and `stat_keys.id`.
+# Raw rows are rolled up into hourly buckets, and hourly buckets into daily ones. Each table only keeps
+# so many days, so the history stays a bounded size no matter how long the server runs.
+
+HOUR_MS = 60 * 60 * 1000
+DAY_MS = 24 * HOUR_MS
+
+RAW_RETENTION_DAYS = 3
+HOURLY_RETENTION_DAYS = 90
+DAILY_RETENTION_DAYS = 2 * 365
+
+# How far back each rollup is recomputed. Buckets are rebuilt from the finer table, so this has to be
+# shorter than the finer table's retention, and long enough to cover the rollup being missed for a while.
+HOURLY_ROLLUP_WINDOW_MS = 2 * DAY_MS
+DAILY_ROLLUP_WINDOW_MS = 7 * DAY_MS
+
+# Table, time column, bucket size and retention for each resolution, finest first
+RESOLUTIONS = {
+    "raw": ("stat_history", "timestamp", None, RAW_RETENTION_DAYS * DAY_MS),
+    "hourly": ("stat_history_hourly", "bucket", HOUR_MS, HOURLY_RETENTION_DAYS * DAY_MS),
+    "daily": ("stat_history_daily", "bucket", DAY_MS, DAILY_RETENTION_DAYS * DAY_MS),
+}
+
+# Requests spanning more than this use the next coarser resolution, to keep responses a sane size
+MAX_RANGE_MS = {
+    "raw": 2 * DAY_MS,
+    "hourly": 60 * DAY_MS,
+    "daily": None,
+}
+
+
+def record_history(cursor, rows: list, timestamp: int) -> None:
+    """
+    Appends stat changes to the raw history.
+
+    `param rows` List of `(player_id, stat_key_id, stat_value, delta)`.
+    `param timestamp` Time of the change in ms.
+    """
+    cursor.executemany("""
+        INSERT OR REPLACE INTO stat_history (player_id, stat_key_id, timestamp, stat_value, delta)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(player_id, stat_key_id, timestamp, stat_value, delta)
+          for player_id, stat_key_id, stat_value, delta in rows])
+
+
+def _rollup(cursor, source: str, target: str, window_ms: int, now: int) -> None:
+    source_table, source_time, _, _ = RESOLUTIONS[source]
+    target_table, _, bucket_ms, _ = RESOLUTIONS[target]
+
+    # Only complete buckets, so a bucket is never written with half of its rows
+    until = now // bucket_ms * bucket_ms
+    since = until - window_ms // bucket_ms * bucket_ms
+
+    # The bare `stat_value` next to MAX() comes from the newest row in each bucket
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO {target_table} (player_id, stat_key_id, bucket, stat_value, delta)
+        SELECT player_id, stat_key_id, rollup_bucket, stat_value, total_delta
+        FROM (
+            SELECT player_id, stat_key_id, ({source_time} / ?) * ? AS rollup_bucket,
+                   stat_value, MAX({source_time}), SUM(delta) AS total_delta
+            FROM {source_table}
+            WHERE {source_time} >= ? AND {source_time} < ?
+            GROUP BY player_id, stat_key_id, rollup_bucket
+        )
+    """, (bucket_ms, bucket_ms, since, until))
+
+
+def rollup_history(cursor, now: int = None) -> dict:
+    """
+    Rolls raw history up into hourly buckets, and hourly into daily ones, then drops rows
+    past each resolution's retention. Safe to run as often as you like.
+
+    Returns how many rows were dropped from each table.
+    """
+    now = now or int(time.time() * 1000)
+
+    _rollup(cursor, "raw", "hourly", HOURLY_ROLLUP_WINDOW_MS, now)
+    _rollup(cursor, "hourly", "daily", DAILY_ROLLUP_WINDOW_MS, now)
+
+    dropped = {}
+    for table, time_column, _, retention_ms in RESOLUTIONS.values():
+        cursor.execute(f"DELETE FROM {table} WHERE {time_column} < ?", (now - retention_ms,))
+        dropped[table] = cursor.rowcount
+
+    return dropped
+
+
+def pick_resolution(start: int, end: int, now: int = None) -> str:
+    """
+    Returns the finest resolution that still has data back to `start`, and isn't too fine for the range.
+    """
+    now = now or int(time.time() * 1000)
+
+    for resolution, (_, _, _, retention_ms) in RESOLUTIONS.items():
+        max_range = MAX_RANGE_MS[resolution]
+        if start >= now - retention_ms and (max_range is None or end - start <= max_range):
+            return resolution
+
+    return "daily"
+
+
+def get_history(cursor, player_uuid: str, category: str, stat_key: str, start: int, end: int) -> tuple:
+    """
+    Returns the resolution used, and a list of `(timestamp, stat_value, delta)` points between `start` and `end`.
+    """
+    resolution = pick_resolution(start, end)
+    table, time_column, _, _ = RESOLUTIONS[resolution]
+
+    cursor.execute(f"""
+        SELECT {time_column}, stat_value, delta
+        FROM {table}
+        WHERE player_id = (SELECT id FROM stat_players WHERE uuid = ?)
+          AND stat_key_id = (SELECT id FROM stat_keys WHERE category = ? AND stat_key = ?)
+          AND {time_column} >= ? AND {time_column} <= ?
+        ORDER BY {time_column} ASC
+    """, (player_uuid, category, stat_key, start, end))
+
+    return resolution, cursor.fetchall()
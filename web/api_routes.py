@@ -1,5 +1,5 @@
 from flask import Blueprint, jsonify, send_from_directory, request
-from werkzeug.exceptions import NotFound
+from werkzeug.exceptions import NotFound, RequestEntityTooLarge
 import sqlite3
 import traceback
 import time
@@ -8,8 +8,14 @@ import os
 import json
 import uuid
 
-from config import log, ATLAS_DB_FILE, STATS_DB_FILE, PLAYER_BODY_SKIN_DIR, PLAYER_FACE_SKIN_DIR
-from config import SHOWCASE_SUBMISSIONS_DIR, SHOWCASE_IMAGES_DIR
+from config import log
+from config import SHOWCASE_SUBMISSIONS_DIR, SHOWCASE_IMAGES_DIR, SHOWCASE_MAX_UPLOAD_SIZE
+from db import atlas_db
+from response_cache import response_cache, get_data_versions
+from skin_store import skin_store, skin_hash_sql, url_hash
+from showcase_processor import VARIANTS_DIR
+from showcase_manifest import showcase_manifest, date_key
+from uploads import parse_upload
 
 api_routes = Blueprint("api_blueprint", __name__)
 
@@ -24,89 +30,179 @@ ALLOWED_ATTRIBUTES = {}
 def api():
     return "ok", 200
 
+def build_status():
+    with atlas_db.connection() as conn:
+        cursor = conn.cursor()
+
+        # Check if the data is up to date
+        cursor.execute("""
+            SELECT variable, value
+            FROM variables
+            WHERE variable IN ('last_players_update', 'last_kills_update')
+        """)
+        result = dict(cursor.fetchall())
+
+        # Count online players (those with online_duration > 0)
+        cursor.execute("""
+            SELECT COUNT(*) 
+            FROM players 
+            WHERE online_duration > 0
+        """)
+        online_players_count = cursor.fetchone()[0]
+
+    last_players_update = int(result.get("last_players_update", 0))
+    last_kills_update = int(result.get("last_kills_update", 0))
+
+    current_time = int(time.time()) * 1000
+
+    players_update_age = (current_time - last_players_update) // 60000
+    chat_update_age = (current_time - last_kills_update) // 60000
+
+    if players_update_age < 5 and chat_update_age < 5:  # NOTE THIS IS IN MINUTES!!!!
+        status = "ok"
+    else:
+        status = "stale"
+
+    return {
+        "status": status,
+        "online_players": online_players_count,
+        "last_players_update_age": players_update_age,
+        "last_kills_update_age": chat_update_age,
+    }
+
 @api_routes.route("/api/status")
 def get_status():
     try:
-        with sqlite3.connect(ATLAS_DB_FILE) as conn:
-            cursor = conn.cursor()
-
-            # Check if the data is up to date
-            cursor.execute("""
-                SELECT variable, value
-                FROM variables
-                WHERE variable IN ('last_players_update', 'last_kills_update')
-            """)
-            result = dict(cursor.fetchall())
-
-            # Count online players (those with online_duration > 0)
-            cursor.execute("""
-                SELECT COUNT(*) 
-                FROM players 
-                WHERE online_duration > 0
-            """)
-            online_players_count = cursor.fetchone()[0]
-
-        last_players_update = int(result.get("last_players_update", 0))
-        last_kills_update = int(result.get("last_kills_update", 0))
+        versions = get_data_versions()
 
-        current_time = int(time.time()) * 1000
+        # The ages are in minutes, so the response also changes every minute even if the data doesn't
+        key = (versions.get("last_players_update"), versions.get("last_kills_update"), int(time.time()) // 60)
 
-        players_update_age = (current_time - last_players_update) // 60000
-        chat_update_age = (current_time - last_kills_update) // 60000
-
-        if players_update_age < 5 and chat_update_age < 5:  # NOTE THIS IS IN MINUTES!!!!
-            status = "ok"
-        else:
-            status = "stale"
-
-        return {
-            "status": status,
-            "online_players": online_players_count,
-            "last_players_update_age": players_update_age,
-            "last_kills_update_age": chat_update_age,
-        }, 200
+        return response_cache.response("status", key, build_status), 200
     except Exception:
         log.error(f"Internal error getting `status`: {traceback.format_exc()}")
         return {"error": "internal error"}, 500
 
 
 # Players
+# Columns `/api/players` can return, and the SQL for each. `uuid` is always included.
+PLAYER_FIELDS = {
+    "uuid": "uuid",
+    "name": "name",
+    "online_duration": "online_duration",
+    "afk_duration": "afk_duration",
+    "first_joined": "first_joined",
+    "bio": "bio",
+    "last_online": "last_online",
+    "skin_hash": skin_hash_sql("players.uuid", "body"),    # For `skinUrl()` in api.js
+    "status": """
+        CASE 
+            WHEN online_duration > 0 AND afk_duration > 0 THEN 'afk'
+            WHEN online_duration > 0 THEN 'online'
+            ELSE 'offline'
+        END"""
+}
+
+PLAYERS_ORDER_BY = """
+    ORDER BY    -- Online first, then AFK, then offline.
+        CASE 
+            WHEN online_duration > 0 AND afk_duration = 0 THEN 1
+            WHEN online_duration > 0 AND afk_duration > 0 THEN 2
+            ELSE 3
+        END,
+        CASE 
+            WHEN online_duration > 0 AND afk_duration = 0 THEN -online_duration
+            ELSE last_online
+        END DESC
+"""
+
+MAX_PLAYERS_PER_PAGE = 500
+
+
+def select_players(fields) -> str:
+    return ", ".join(f"{PLAYER_FIELDS[field]} AS {field}" for field in fields)
+
+def build_players():
+    with atlas_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+
+        cursor.execute(f"SELECT {select_players(PLAYER_FIELDS)} FROM players {PLAYERS_ORDER_BY}")
+        return [dict(row) for row in cursor.fetchall()]
+
+def get_players_delta(since, page, per_page, fields):
+    """
+    Returns the players changed after version `since` (every player if `None`), one page at a time.
+    The `version` in the response is what to send as `since` next time. Tombstones for removed players
+    are only sent with the first page.
+    """
+    with atlas_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+
+        # One read transaction, so the version matches the rows
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute("""
+                SELECT MAX(COALESCE((SELECT MAX(updated_at) FROM players), 0),
+                           COALESCE((SELECT MAX(deleted_at) FROM deleted_players), 0))
+            """)
+            version = cursor.fetchone()[0]
+
+            where = "" if since is None else "WHERE updated_at > :since"
+            cursor.execute(f"""
+                SELECT {select_players(fields)}
+                FROM players
+                {where}
+                {PLAYERS_ORDER_BY}
+                LIMIT :limit OFFSET :offset
+            """, {"since": since, "limit": per_page + 1, "offset": (page - 1) * per_page})
+            players = [dict(row) for row in cursor.fetchall()]
+
+            removed = []
+            if since is not None and page == 1:
+                cursor.execute("SELECT uuid FROM deleted_players WHERE deleted_at > ?", (since,))
+                removed = [row["uuid"] for row in cursor.fetchall()]
+        finally:
+            conn.rollback()
+
+    return {
+        "version": max(version, since or 0),
+        "players": players[:per_page],
+        "removed": removed,
+        "next_page": page + 1 if len(players) > per_page else None     # Fetched one extra row to know if there's more
+    }
+
 @api_routes.route("/api/players")
 def get_all_players():
+    """
+    With no args, returns every player. Polled by lots of clients, so it's cached.
+
+    Optional args, which return `{"version", "players", "removed", "next_page"}` instead:
+    `since` Only players changed after this version, plus the UUIDs of removed players.
+    `page` and `per_page` (max 500) for paging. `fields` Comma separated columns to return, see `PLAYER_FIELDS`.
+    """
     try:
-        with sqlite3.connect(ATLAS_DB_FILE) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+        if not request.args:
+            key = get_data_versions().get("last_players_update")
 
-            cursor.execute("""
-                SELECT 
-                    uuid, 
-                    name, 
-                    online_duration, 
-                    afk_duration, 
-                    first_joined,
-                    bio,
-                    last_online,
-                    CASE 
-                        WHEN online_duration > 0 AND afk_duration > 0 THEN 'afk'
-                        WHEN online_duration > 0 THEN 'online'
-                        ELSE 'offline'
-                    END AS status
-                FROM players
-                ORDER BY    -- Online first, then AFK, then offline.
-                    CASE 
-                        WHEN online_duration > 0 AND afk_duration = 0 THEN 1
-                        WHEN online_duration > 0 AND afk_duration > 0 THEN 2
-                        ELSE 3
-                    END,
-                    CASE 
-                        WHEN online_duration > 0 AND afk_duration = 0 THEN -online_duration
-                        ELSE last_online
-                    END DESC
-            """)
-            players = [dict(row) for row in cursor.fetchall()]
+            return response_cache.response("players", key, build_players), 200
+
+        since = request.args.get("since", type=int)
+        page = request.args.get("page", 1, type=int)
+        per_page = request.args.get("per_page", 100, type=int)
+
+        fields = ["uuid"]
+        for field in request.args.get("fields", ",".join(PLAYER_FIELDS)).split(","):
+            if field not in PLAYER_FIELDS:
+                return {"error": "invalid request: unknown field"}, 400
+            if field not in fields:
+                fields.append(field)
 
-        return jsonify(players), 200
+        if page < 1 or not 1 <= per_page <= MAX_PLAYERS_PER_PAGE:
+            return {"error": "invalid request: bad page or per_page"}, 400
+
+        return jsonify(get_players_delta(since, page, per_page, fields)), 200
     except Exception:
         log.error(f"Internal error getting `players`: {traceback.format_exc()}")
         return {"error": "internal error"}, 500
@@ -114,7 +210,7 @@ def get_all_players():
 @api_routes.route("/api/uuid_to_name/<uuid>")
 def get_name_from_uuid(uuid):
     try:
-        with sqlite3.connect(ATLAS_DB_FILE) as conn:
+        with atlas_db.connection() as conn:
             cursor = conn.cursor()
 
             cursor.execute("SELECT name FROM players WHERE uuid = ?", (uuid,))
@@ -128,64 +224,105 @@ def get_name_from_uuid(uuid):
         log.error(f"Internal error getting `uuid_to_name`: {traceback.format_exc()}")
         return {"error": "internal error"}, 500
 
-@api_routes.route("/api/players_misc")
-def get_players_misc():
-    try:
-        with sqlite3.connect(ATLAS_DB_FILE) as conn:
-            cursor = conn.cursor()
+def build_players_misc():
+    with atlas_db.connection() as conn:
+        cursor = conn.cursor()
 
-            cursor.execute("SELECT COUNT(*) FROM players")
-            total_players = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM players")
+        total_players = cursor.fetchone()[0]
 
-            # A player is considered active if they've logged in within the last 14 days
-            fourteen_days_ago_ms = (int(time.time()) - (14 * 24 * 60 * 60)) * 1000
-            cursor.execute("""
-                SELECT COUNT(*)
-                FROM players
-                WHERE last_online >= ?
-            """, (fourteen_days_ago_ms,))
-            active_players = cursor.fetchone()[0]
+        # A player is considered active if they've logged in within the last 14 days
+        fourteen_days_ago_ms = (int(time.time()) - (14 * 24 * 60 * 60)) * 1000
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM players
+            WHERE last_online >= ?
+        """, (fourteen_days_ago_ms,))
+        active_players = cursor.fetchone()[0]
 
+    return {
+        "total_players": total_players,
+        "active_players": active_players
+    }
 
-        return {
-            "total_players": total_players,
-            "active_players": active_players
-        }, 200
+@api_routes.route("/api/players_misc")
+def get_players_misc():
+    try:
+        # Players also go inactive as time passes, so rebuild at least every minute
+        key = (get_data_versions().get("last_players_update"), int(time.time()) // 60)
+
+        return response_cache.response("players_misc", key, build_players_misc), 200
     except Exception:
         log.error(f"Internal error getting `players_misc`: {traceback.format_exc()}")
         return {"error": "internal error"}, 500
 
 
 # Kills
+MAX_KILLS_PER_PAGE = 500
+
+# Also used by the stream
+KILL_COLUMNS = f"""
+    id, killer_uuid, killer_name, victim_uuid, victim_name, death_message, weapon_json, timestamp,
+    {skin_hash_sql("killer_uuid", "body")} AS killer_skin_hash,
+    {skin_hash_sql("victim_uuid", "body")} AS victim_skin_hash
+"""
+
 @api_routes.route("/api/kill_history")
 def get_kill_history():
+    """
+    Returns kills oldest first. Paged on `id`, so every page costs the same however far back it is.
+
+    `newest_kill_id` Kills after this ID (used for updates), default limit 50.
+    `oldest_kill_id` Kills before this ID (used for scrolling back), default limit 100.
+    Neither gives the newest kills (used on page load), default limit 100.
+    `limit` Up to 500. `killer_uuid` and `victim_uuid` to only get a player's kills or deaths.
+    """
     try:
-        oldest_kill_id = request.args.get("oldest_kill_id", type=int) # Unused for now
+        oldest_kill_id = request.args.get("oldest_kill_id", type=int)
         newest_kill_id = request.args.get("newest_kill_id", type=int)
+        killer_uuid = request.args.get("killer_uuid")
+        victim_uuid = request.args.get("victim_uuid")
+        limit = request.args.get("limit", 50 if newest_kill_id else 100, type=int)
 
         if oldest_kill_id and newest_kill_id:
             return {"error": "invalid request: multiple args present"}, 400
-
-        with sqlite3.connect(ATLAS_DB_FILE) as conn:
-            conn.row_factory = sqlite3.Row
+        if not 1 <= limit <= MAX_KILLS_PER_PAGE:
+            return {"error": "invalid request: bad limit"}, 400
+
+        # Each filter is covered by an index, which holds the `id` too, so the range is still a seek
+        conditions = []
+        params = []
+        if killer_uuid:
+            conditions.append("killer_uuid = ?")
+            params.append(killer_uuid)
+        if victim_uuid:
+            conditions.append("victim_uuid = ?")
+            params.append(victim_uuid)
+
+        if newest_kill_id:  # New messages after a certain ID (used for updates)
+            conditions.append("id > ?")
+            params.append(newest_kill_id)
+            order = "ASC"
+        elif oldest_kill_id:    # Older messages before a certain ID (used for scrolling back)
+            conditions.append("id < ?")
+            params.append(oldest_kill_id)
+            order = "DESC"
+        else:   # All of the newest messages (used on page load)
+            order = "DESC"
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with atlas_db.connection() as conn:
             cursor = conn.cursor()
-            
-            if newest_kill_id: # New messages after a certain ID (used for updates)
-                cursor.execute("""
-                    SELECT id, killer_uuid, killer_name, victim_uuid, victim_name, death_message, weapon_json, timestamp
-                    FROM kills
-                    WHERE id > ?
-                    ORDER BY id ASC
-                    LIMIT 50
-                """, (newest_kill_id,))
-            
-            else:   # All of the newest messages (used on page load)
-                cursor.execute("""
-                    SELECT id, killer_uuid, killer_name, victim_uuid, victim_name, death_message, weapon_json, timestamp
-                    FROM kills
-                    ORDER BY id DESC
-                    LIMIT 100
-                """)
+            cursor.row_factory = sqlite3.Row
+
+            cursor.execute(f"""
+                SELECT {KILL_COLUMNS}
+                FROM kills
+                {where}
+                ORDER BY id {order}
+                LIMIT ?
+            """, params + [limit])
 
             kills = []
 
@@ -198,51 +335,103 @@ def get_kill_history():
                     "victim_uuid": row["victim_uuid"],
                     "victim_name": row["victim_name"],
 
+                    "killer_skin_hash": row["killer_skin_hash"],
+                    "victim_skin_hash": row["victim_skin_hash"],
+
                     "death_message": row["death_message"],
                     "weapon_json": row["weapon_json"],
 
                     "timestamp": row["timestamp"]
                 })
 
-        kills.reverse()
+        if order == "DESC":
+            kills.reverse()
 
         return jsonify(kills), 200
     except Exception:
         log.error(f"Internal error getting `chat_messages`: {traceback.format_exc()}")
         return jsonify({"error": "internal error"}), 500
 
+def build_kills_misc():
+    with atlas_db.connection() as conn:
+        cursor = conn.cursor()
+
+        # Kept up to date by triggers on `kills`, see `db_utils.py`
+        cursor.execute("SELECT total_kills, unique_victims, unique_killers FROM kill_totals")
+        total_kills, unique_victims, unique_killers = cursor.fetchone() or (0, 0, 0)
+
+    return {
+        "total_kills": total_kills,
+        "unique_victims": unique_victims,
+        "unique_killers": unique_killers
+    }
+
 @api_routes.route("/api/kills_misc")
 def get_kills_misc():
     try:
-        with sqlite3.connect(ATLAS_DB_FILE) as conn:
-            cursor = conn.cursor()
+        key = get_data_versions().get("last_kills_update")
 
-            cursor.execute("SELECT COUNT(*) FROM kills")
-            total_kills = cursor.fetchone()[0]
+        return response_cache.response("kills_misc", key, build_kills_misc), 200
+    except Exception:
+        log.error(f"Internal error getting `kills_misc`: {traceback.format_exc()}")
+        return {"error": "internal error"}, 500
 
-            # The WHERE clauses shouldn't be necessary, but just in case.
-            cursor.execute("SELECT COUNT(DISTINCT victim_uuid) FROM kills WHERE victim_uuid IS NOT NULL")   
-            unique_victims = cursor.fetchone()[0]
+def build_kills_leaderboard(by):
+    with atlas_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+
+        # `by` is checked against the column names by the route
+        cursor.execute(f"""
+            SELECT player_kill_counts.uuid, COALESCE(players.name, 'Unknown') AS name,
+                   player_kill_counts.kills, player_kill_counts.deaths
+            FROM player_kill_counts
+            LEFT JOIN players ON players.uuid = player_kill_counts.uuid
+            WHERE player_kill_counts.{by} > 0
+            ORDER BY player_kill_counts.{by} DESC
+            LIMIT 100
+        """)
+        return [dict(row) for row in cursor.fetchall()]
+
+@api_routes.route("/api/kills_leaderboard/<by>")
+def get_kills_leaderboard(by):
+    try:
+        if by not in ("kills", "deaths"):
+            return {"error": "invalid request: must be `kills` or `deaths`"}, 400
 
-            cursor.execute("SELECT COUNT(DISTINCT killer_uuid) FROM kills WHERE killer_uuid IS NOT NULL")
-            unique_killers = cursor.fetchone()[0]
+        key = get_data_versions().get("last_kills_update")
 
-        return {
-            "total_kills": total_kills,
-            "unique_victims": unique_victims,
-            "unique_killers": unique_killers
-        }, 200
+        return response_cache.response(f"kills_leaderboard_{by}", key, lambda: build_kills_leaderboard(by)), 200
     except Exception:
-        log.error(f"Internal error getting `kills_misc`: {traceback.format_exc()}")
+        log.error(f"Internal error getting `kills_leaderboard`: {traceback.format_exc()}")
+        return {"error": "internal error"}, 500
+
+def build_weapon_kills():
+    with atlas_db.connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT weapon, kills FROM weapon_kill_counts WHERE kills > 0 ORDER BY kills DESC")
+        return [{"weapon": weapon, "kills": kills} for weapon, kills in cursor.fetchall()]
+
+@api_routes.route("/api/weapon_kills")
+def get_weapon_kills():
+    try:
+        key = get_data_versions().get("last_kills_update")
+
+        return response_cache.response("weapon_kills", key, build_weapon_kills), 200
+    except Exception:
+        log.error(f"Internal error getting `weapon_kills`: {traceback.format_exc()}")
         return {"error": "internal error"}, 500
 
 # Skins
 @api_routes.route("/api/player_skin/<uuid>")
 def get_player_skin(uuid):
     try:
-        return send_from_directory(PLAYER_BODY_SKIN_DIR, f"{uuid}.png")
-    except NotFound:
-        return {"error": "player not found"}, 404
+        response = skin_store.response("body", uuid)
+        if response is None:
+            return {"error": "player not found"}, 404
+
+        return response
     except Exception:
         log.error(f"Internal error getting `player_skin`: {traceback.format_exc()}")
         return {"error": "internal error"}, 500
@@ -250,37 +439,108 @@ def get_player_skin(uuid):
 @api_routes.route("/api/player_face/<uuid>")
 def get_player_face(uuid):
     try:
-        return send_from_directory(PLAYER_FACE_SKIN_DIR, f"{uuid}.png")
-    except NotFound:
-        return {"error": "player not found"}, 404
+        response = skin_store.response("face", uuid)
+        if response is None:
+            return {"error": "player not found"}, 404
+
+        return response
     except Exception:
         log.error(f"Internal error getting `player_face`: {traceback.format_exc()}")
         return {"error": "internal error"}, 500
 
+# Face atlas. Every face in one image, see `face_atlas.py`
+MAX_ATLAS_UUIDS = 500
+
+def get_atlas_uuids():
+    """
+    The `uuids` arg split into a list without duplicates, `None` if it's not present (so every face),
+    or `False` if there are too many.
+    """
+    uuids = request.args.get("uuids")
+    if uuids is None:
+        return None
+
+    uuids = list(dict.fromkeys(uuid for uuid in uuids.split(",") if uuid))
+    if len(uuids) > MAX_ATLAS_UUIDS:
+        return False
+
+    return uuids
+
+@api_routes.route("/api/face_atlas")
+def get_face_atlas():
+    """
+    The offset map for `/api/face_atlas.png`, plus `version` and the `image` URL to load it from.
+    `uuids` Optional comma separated UUIDs (max 500), to only include those players.
+    """
+    try:
+        uuids = get_atlas_uuids()
+        if uuids is False:
+            return {"error": "invalid request: too many uuids"}, 400
+
+        atlas = skin_store.face_atlas(uuids)
+        if atlas is None:
+            return {"error": "face atlas not built yet"}, 404
+
+        version = url_hash(atlas[0])
+        query = f"v={version}" if uuids is None else f"uuids={','.join(uuids)}&v={version}"
+
+        return {"version": version, "image": f"/api/face_atlas.png?{query}", **atlas[2]}, 200
+    except Exception:
+        log.error(f"Internal error getting `face_atlas`: {traceback.format_exc()}")
+        return {"error": "internal error"}, 500
+
+@api_routes.route("/api/face_atlas.png")
+def get_face_atlas_image():
+    """
+    `uuids` Optional, the same as for `/api/face_atlas`.
+    """
+    try:
+        uuids = get_atlas_uuids()
+        if uuids is False:
+            return {"error": "invalid request: too many uuids"}, 400
+
+        atlas = skin_store.face_atlas(uuids)
+        if atlas is None:
+            return {"error": "face atlas not built yet"}, 404
+
+        etag, image, _ = atlas
+
+        return skin_store.png_response(image, etag)
+    except Exception:
+        log.error(f"Internal error getting `face_atlas.png`: {traceback.format_exc()}")
+        return {"error": "internal error"}, 500
+
 
 
 # Showcase
-# TODO: compress images before saving them, and maybe convert them to webp
+# Images are served as uploaded. The updater makes the WebP variants the gallery loads, see `showcase_processor.py`
+SHOWCASE_VARIANT_MAX_AGE = 365 * 24 * 60 * 60   # Variant names include a hash of the original, so they never change
+MAX_PHOTOS_PER_PAGE = 100
+
 @api_routes.route("/api/submit_photo", methods=["POST"])
 def submit_build():
+    """
+    The photo is streamed straight to disk while the request is read, and checked and cleaned up later by the updater
+    (see `process_submissions()` in showcase_processor.py), so this only has to move it into place.
+    """
+    uploads = []
     try:
         os.makedirs(SHOWCASE_SUBMISSIONS_DIR, exist_ok=True)
 
-        photo_title = request.form.get("photo-title")
-        photo_date = request.form.get("photo-date")
-        photographer = request.form.get("photographer")
+        form, files, uploads = parse_upload(SHOWCASE_SUBMISSIONS_DIR, SHOWCASE_MAX_UPLOAD_SIZE)
+
+        photo_title = form.get("photo-title")
+        photo_date = form.get("photo-date")
+        photographer = form.get("photographer")
 
         # Validate form data
         if not photo_title or not photo_date or not photographer:
             return jsonify({"error": "missing required form data"}), 400
 
-        photo_file = request.files.get("photo-file")
-        if not photo_file:
+        photo_file = files.get("photo-file")
+        if not photo_file or not photo_file.filename:
             return jsonify({"error": "no file provided"}), 400
-
-        if len(photo_file.read()) > 10 * 1024 * 1024:  # 10 MB limit
-            return jsonify({"error": "file size exceeds limit"}), 400
-        photo_file.seek(0)
+        upload = photo_file.stream
 
         # Clean the file name
         extension = os.path.splitext(photo_file.filename)[1].lower()
@@ -297,32 +557,61 @@ def submit_build():
 
         os.makedirs(folder_path, exist_ok=True)
 
-        # Save the image and metadata
+        # Save the image, then the metadata. The updater only picks up folders with metadata, so it never sees a half moved photo
+        photo_file_path = os.path.join(folder_path, file_name)
+        upload.save(photo_file_path)
+
         image_metadata = {
             "photo_title": photo_title,
             "photo_date": photo_date,
             "photographer": photographer,
-            "img_src": f"{file_name}"
+            "img_src": f"{file_name}",
+            "sha256": upload.hexdigest(),   # Of the upload as received. The updater updates them once it's cleaned
+            "size": upload.size,
+            "status": "pending"     # Until the updater has checked it
         }
-        
+
         with open(os.path.join(folder_path, f"{image_metadata.get('photo_title', 'untitled')}-data.json"), "w") as json_file:
             json.dump(image_metadata, json_file, indent=4)
 
-        photo_file_path = os.path.join(folder_path, file_name)
-        photo_file.save(photo_file_path)
-
         log.info(f"Submission saved in folder: {folder_name}")
 
-        return jsonify({"message": "Submission successful"}), 200
+        return jsonify({"message": "Submission received"}), 202
+    except RequestEntityTooLarge:
+        return jsonify({"error": "file size exceeds limit"}), 413
     except Exception:
         log.error(f"Error processing showcase submission: {traceback.format_exc()}")
         return jsonify({"error": "internal error"}), 500
+    finally:
+        for upload in uploads:  # Anything not saved, like extra files or a rejected submission
+            upload.discard()
     
 @api_routes.route("/api/showcase_manifest")
 def get_showcase_manifest():
+    """
+    With no args, returns every photo, newest first.
+
+    Optional args, which return `{"version", "total", "photos", "next_page"}` instead:
+    `page` and `per_page` (max 100) for paging. `photographer` Only their photos.
+    `from` and `to` Only photos taken on these dates or between them, `YYYY-MM-DD`.
+    """
     try:
-        with open("../db/showcase_imgs/showcase_manifest.json", "r") as file:
-            return jsonify(json.load(file)), 200
+        if not request.args:
+            return response_cache.response("showcase_manifest", showcase_manifest.version, showcase_manifest.all), 200
+
+        page = request.args.get("page", 1, type=int)
+        per_page = request.args.get("per_page", 24, type=int)
+        date_from = request.args.get("from")
+        date_to = request.args.get("to")
+
+        if page < 1 or not 1 <= per_page <= MAX_PHOTOS_PER_PAGE:
+            return {"error": "invalid request: bad page or per_page"}, 400
+        if any(date is not None and date_key(date) == "0000-00-00" for date in (date_from, date_to)):
+            return {"error": "invalid request: dates must be YYYY-MM-DD"}, 400
+
+        return jsonify(showcase_manifest.page(
+            page, per_page, photographer=request.args.get("photographer"), date_from=date_from, date_to=date_to
+        )), 200
     except Exception:
         log.error(f"Error getting `showcase_submissions`: {traceback.format_exc()}")
         return {"error": "internal error"}, 500
@@ -336,3 +625,18 @@ def get_showcase_img(file_name):
     except Exception:
         log.error(f"Internal error getting `showcase_img`: {traceback.format_exc()}")
         return {"error": "internal error"}, 500
+
+@api_routes.route(f"/api/showcase_img/{VARIANTS_DIR}/<file_name>")
+def get_showcase_img_variant(file_name):
+    try:
+        response = send_from_directory(
+            os.path.join(SHOWCASE_IMAGES_DIR, VARIANTS_DIR), file_name, max_age=SHOWCASE_VARIANT_MAX_AGE
+        )
+        response.headers["Cache-Control"] += ", immutable"
+
+        return response
+    except NotFound:
+        return {"error": "not found"}, 404
+    except Exception:
+        log.error(f"Internal error getting `showcase_img_variant`: {traceback.format_exc()}")
+        return {"error": "internal error"}, 500
@@ -1,22 +1,65 @@
 import os
-from flask import Flask
+import time
+from flask import Flask, request
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 from template_routes import template_routes
 from api_routes import api_routes
 from stats_routes import stats_routes
-from config import log
+from stream_routes import stream_routes
+from config import log, MAX_CONTENT_LENGTH, COMPRESSED_STATIC_DIR
+from db import atlas_db, stats_db
+from response_cache import response_cache
+from skin_store import skin_store
+import compression
 import socket
 
 
 log.info("---- Starting AtlasCivs Webserver ----")
 
 app = Flask(__name__, template_folder="html", static_folder="")  # Tell Flask `static` is the current directory
+app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH   # Bigger requests are rejected before the body is read
+compression.init_app(app, COMPRESSED_STATIC_DIR)    # First, so its `after_request` runs after every other one
 
 app.register_blueprint(template_routes)
 app.register_blueprint(api_routes)
 app.register_blueprint(stats_routes)
+app.register_blueprint(stream_routes)
+
+
+@app.after_request
+def conditional_json(response):
+    """
+    Gives every JSON response a strong ETag, and turns it into an empty `304 Not Modified` if the client
+    already has it (see `fetchJSON()` in api.js). Cached responses come with their ETag already set.
+    """
+    if request.method == "GET" and response.status_code == 200 and response.mimetype == "application/json":
+        if response.get_etag()[0] is None:
+            response.add_etag()
+
+        response.headers["Cache-Control"] = "no-cache"  # Can be stored, but always revalidated
+        response.make_conditional(request)
+
+    return response
+
+
+# Counters are per gunicorn worker, so each one logs its own
+CACHE_STATS_INTERVAL = 10 * 60  # Seconds
+cache_stats_logged = time.monotonic()
+
+@app.after_request
+def log_cache_stats(response):
+    global cache_stats_logged
+
+    if time.monotonic() - cache_stats_logged > CACHE_STATS_INTERVAL:
+        cache_stats_logged = time.monotonic()
+        log.info(
+            f"Worker {os.getpid()} stats: atlas_db {atlas_db.stats()}, stats_db {stats_db.stats()}, "
+            f"response_cache {response_cache.stats()}, skin_store {skin_store.stats()}"
+        )
+
+    return response
 
 
 if __name__ == "__main__":
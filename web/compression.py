@@ -0,0 +1,199 @@
+import gzip
+import os
+
+from flask import Response, request
+
+try:
+    import brotli   # Optional, gzip is used if it's not installed
+except ImportError:
+    brotli = None
+
+# Compression for everything the webserver sends, besides images and the event stream.
+#
+# Static files (`STATIC_DIRS`) are compressed once at startup into `COMPRESSED_STATIC_DIR` at the highest levels,
+# and the cached responses are compressed once per version (see `ResponseCache.response()`).
+# Anything else big enough, like the rendered templates and uncached JSON, is compressed on the fly at faster levels.
+#
+# Compressed responses get a weak ETag, as the bytes differ from the uncompressed ones. `If-None-Match` is compared
+# weakly, so conditional requests still work the same.
+
+STATIC_DIRS = ("js", "css")
+STATIC_FILES = ("manifest.json",)
+MIN_SIZE = 1024     # Bytes. Smaller than this isn't worth the CPU, and can even come out bigger
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "application/manifest+json", "application/javascript", "text/javascript",
+    "text/html", "text/css", "text/plain", "image/svg+xml"
+}
+
+# (static, on the fly) levels
+GZIP_LEVELS = (9, 6)
+BROTLI_QUALITIES = (11, 5)
+
+ENCODING_EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+
+
+def supported_encodings() -> list:
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+def choose_encoding():
+    """
+    The best encoding the client accepts, or `None`.
+    """
+    for encoding in supported_encodings():
+        if request.accept_encodings[encoding]:  # Quality of 0 if it's not accepted
+            return encoding
+
+    return None
+
+
+def compress(data: bytes, encoding, static=False) -> bytes:
+    level = 0 if static else 1
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITIES[level])
+
+    return gzip.compress(data, GZIP_LEVELS[level], mtime=0)     # `mtime=0` so the same input gives the same bytes
+
+
+def compressed_response(body: bytes, etag, encoding, mimetype) -> Response:
+    """
+    A response of already compressed bytes, for `ResponseCache`.
+    """
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag, weak=True)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+
+    return response
+
+
+def _should_compress(response) -> bool:
+    return (
+        response.status_code == 200
+        and "Content-Encoding" not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+    )
+
+
+class StaticCompressor:
+    """
+    `param static_dir` The app's static folder.
+    `param cache_dir` Where the compressed copies go. Shared by every worker, and kept out of the source tree.
+    """
+
+    def __init__(self, static_dir, cache_dir):
+        self.static_dir = static_dir
+        self.cache_dir = cache_dir
+
+    def _static_files(self) -> list:
+        files = [file_name for file_name in STATIC_FILES if os.path.isfile(os.path.join(self.static_dir, file_name))]
+
+        for static_dir in STATIC_DIRS:
+            for root, _, file_names in os.walk(os.path.join(self.static_dir, static_dir)):
+                files += [os.path.relpath(os.path.join(root, file_name), self.static_dir) for file_name in file_names]
+
+        return files
+
+    def _cache_path(self, file_name, encoding) -> str:
+        return os.path.join(self.cache_dir, file_name + ENCODING_EXTENSIONS[encoding])
+
+    def precompress(self) -> int:
+        """
+        Compresses every static file that changed since it was last compressed. Returns how many files were written.
+        """
+        written = 0
+
+        for file_name in self._static_files():
+            source_path = os.path.join(self.static_dir, file_name)
+            if os.path.getsize(source_path) < MIN_SIZE:
+                continue
+            source_mtime = os.path.getmtime(source_path)
+
+            for encoding in supported_encodings():
+                cache_path = self._cache_path(file_name, encoding)
+                if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= source_mtime:
+                    continue
+
+                with open(source_path, "rb") as file:
+                    data = compress(file.read(), encoding, static=True)
+
+                # Every worker does this at startup, so temp file first so they never read a half written one
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as file:
+                    file.write(data)
+                os.replace(tmp_path, cache_path)
+                written += 1
+
+        return written
+
+    def response(self, response, file_name, encoding):
+        """
+        Swaps a static file response for its precompressed copy, or returns `None` if there isn't an up to date one.
+        """
+        source_path = os.path.join(self.static_dir, file_name)
+        cache_path = self._cache_path(file_name, encoding)
+        try:
+            if os.path.getmtime(cache_path) < os.path.getmtime(source_path):    # Edited since startup
+                return None
+
+            with open(cache_path, "rb") as file:
+                data = file.read()
+        except OSError:     # Not a precompressed file
+            return None
+
+        compressed = Response(data, content_type=response.content_type)
+        for header in ("Cache-Control", "Last-Modified", "Expires"):
+            if header in response.headers:
+                compressed.headers[header] = response.headers[header]
+
+        etag = response.get_etag()[0]
+        if etag:
+            compressed.set_etag(etag, weak=True)
+        compressed.headers["Content-Encoding"] = encoding
+        compressed.vary.add("Accept-Encoding")
+
+        response.close()    # The uncompressed file was opened for sending
+
+        return compressed
+
+
+def init_app(app, cache_dir) -> StaticCompressor:
+    """
+    Precompresses the static files and compresses every response after that.
+    Call before registering any other `after_request`, so this one runs last and sees the final response.
+    """
+    static = StaticCompressor(app.static_folder, cache_dir)
+    static.precompress()
+
+    @app.after_request
+    def compress_response(response):
+        if request.method not in ("GET", "HEAD") or not _should_compress(response):
+            return response
+
+        response.vary.add("Accept-Encoding")    # Even if this client doesn't get it compressed, caches need to know
+
+        encoding = choose_encoding()
+        if encoding is None:
+            return response
+
+        if request.endpoint == "static":
+            return static.response(response, request.view_args["filename"], encoding) or response
+
+        # Files sent by other routes, and streams like `/api/stream`, which has to be sent as it's generated
+        if response.direct_passthrough or response.is_streamed:
+            return response
+
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag = response.get_etag()[0]
+        if etag:
+            response.set_etag(etag, weak=True)
+
+        return response
+
+    return static
@@ -15,11 +15,13 @@ LOG_FILE = "../logs/webserver.log"
 ATLAS_DB_FILE = "../db/atlascivs.db"
 STATS_DB_FILE = "../db/atlas_stats.db"
 
-PLAYER_BODY_SKIN_DIR = "../db/player_body_skins/"
-PLAYER_FACE_SKIN_DIR = "../db/player_face_skins/"
-
 SHOWCASE_SUBMISSIONS_DIR = "../db/showcase_submissions/"
 SHOWCASE_IMAGES_DIR = "../db/showcase_imgs/"
+SHOWCASE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024     # Per photo
+MAX_CONTENT_LENGTH = SHOWCASE_MAX_UPLOAD_SIZE + 1024 * 1024    # Whole request body. The photo, plus room for the form fields
+
+RESPONSE_CACHE_DIR = "../db/response_cache/"    # Shared by the gunicorn workers
+COMPRESSED_STATIC_DIR = "../db/compressed_static/"     # Precompressed JS/CSS, see compression.py
 
 
 # Setup Logger
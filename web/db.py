@@ -0,0 +1,101 @@
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+
+from config import ATLAS_DB_FILE, STATS_DB_FILE
+
+MMAP_SIZE = 256 * 1024 * 1024   # Same as the updaters (see `configure_connection()` in db_utils.py). Pages are shared by every worker through the OS page cache
+
+
+class ReadOnlyPool:
+    """
+    Reusable read-only connections to one DB, shared by every route in this worker.
+    Saves opening the file and parsing the schema on every request, and keeps each connection's
+    prepared statements around between requests.
+
+    Uses a queue rather than thread locals, so it works the same under sync and gevent workers.
+    The webserver never writes to the DBs, the updaters do, so the connections are opened read only.
+
+    `param db_file` Path to the DB.
+    `param max_idle` Max connections kept open while not in use. More can be open at once under load,
+    they just get closed instead of going back in the pool.
+    `param cached_statements` Prepared statements kept per connection.
+    """
+
+    def __init__(self, db_file, max_idle=8, cached_statements=256):
+        self.db_file = db_file
+        self.cached_statements = cached_statements
+        self.idle = queue.LifoQueue(maxsize=max_idle)   # LIFO so the warmest connection gets reused
+
+        self.lock = threading.Lock()
+        self.hits = 0       # Requests served by a pooled connection
+        self.misses = 0     # Requests that had to open a new one
+        self.discarded = 0  # Connections closed after an error, or because the pool was full
+
+    def open(self) -> sqlite3.Connection:
+        """
+        Opens a new connection, outside of the pool. For things that hold one for good, like the stream hub.
+        """
+        # `mode=ro` fails instead of creating an empty DB if the updater hasn't made it yet
+        uri = f"file:{os.path.abspath(self.db_file)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=self.cached_statements)
+
+        conn.execute("PRAGMA query_only = ON")
+        # Readers pick up the updaters' writes on their next query, and only wait on the WAL briefly if it's checkpointing
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Borrows a connection for the duration of the `with` block.
+        """
+        try:
+            conn = self.idle.get_nowait()
+            with self.lock:
+                self.hits += 1
+        except queue.Empty:
+            conn = self.open()
+            with self.lock:
+                self.misses += 1
+
+        try:
+            yield conn
+        except Exception:
+            # Could be a broken connection, don't hand it to the next request
+            self._discard(conn)
+            raise
+
+        if conn.in_transaction:     # Shouldn't happen with read only queries, but never pool a held snapshot
+            conn.rollback()
+
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    def _discard(self, conn) -> None:
+        conn.close()
+        with self.lock:
+            self.discarded += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            requests = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "discarded": self.discarded,
+                "idle": self.idle.qsize(),
+                "hit_rate": round(self.hits / requests, 3) if requests else 0
+            }
+
+
+# One pool per DB, per worker process
+atlas_db = ReadOnlyPool(ATLAS_DB_FILE)
+stats_db = ReadOnlyPool(STATS_DB_FILE)
@@ -0,0 +1,61 @@
+// Shared API helpers. Loaded in the <head> so every page script can use them.
+
+
+// Conditional GETs for the pollers.
+// Remembers the ETag and data of the last response for each URL, and sends `If-None-Match`
+// so the server can answer `304 Not Modified` with no body when nothing changed.
+const lastResponses = new Map();
+
+async function fetchJSON(url) {
+    const last = lastResponses.get(url);
+    const headers = last ? { "If-None-Match": last.etag } : {};
+
+    const response = await fetch(url, { headers: headers });
+
+    if (response.status === 304 && last) {
+        return { data: last.data, changed: false };
+    }
+    if (!response.ok) {
+        throw new Error(`HTTP error: ${response.status}`);
+    }
+
+    const data = await response.json();
+
+    const etag = response.headers.get("ETag");
+    if (etag) {
+        lastResponses.set(url, { etag: etag, data: data });
+    }
+
+    return { data: data, changed: true };
+}
+
+
+// Skin images. `hash` is the `skin_hash` sent along with the player or kill, and while it's current the server
+// lets the browser cache the image for good. Without one, or once the skin changes, it just gets revalidated.
+function skinUrl(type, uuid, hash) {
+    const path = type === "face" ? "/api/player_face/" : "/api/player_skin/";
+
+    return path + uuid + (hash ? "?v=" + encodeURIComponent(hash) : "");
+}
+
+
+// Live updates pushed by `/api/stream`. One connection per page, shared by every script.
+// While it's connected the pollers skip their requests, and they pick back up if it drops.
+const liveStream = "EventSource" in window ? new EventSource("/api/stream") : null;
+
+function streamConnected() {
+    return liveStream !== null && liveStream.readyState === EventSource.OPEN;
+}
+
+function onStreamEvent(eventName, handler) {
+    if (liveStream) {
+        liveStream.addEventListener(eventName, event => handler(JSON.parse(event.data)));
+    }
+}
+
+// Also called on every reconnect, so pages can catch up on anything sent while they were disconnected
+function onStreamOpen(handler) {
+    if (liveStream) {
+        liveStream.addEventListener("open", handler);
+    }
+}
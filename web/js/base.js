@@ -29,30 +29,31 @@ let failureCount = 0;
 let lastSuccessfulUpdate = Date.now();
 let lastUpdateMinsAgo;
 
+function renderStatus(data) {
+    const onlineCount = document.getElementById("online-count");
+    const statusLight = document.getElementById("nav-status-light");
+    lastStatusData = data;
+
+    if (data.status === "ok") {
+        statusLight.dataset.state = "green";
+        onlineCount.textContent = `${data.online_players} player${data.online_players === 1 ? '' : 's'} online`;
+        failureCount = 0;
+    } else {
+        statusLight.dataset.state = "red";
+        const offlineMinutes = Math.max(data.last_players_update_age, data.last_kills_update_age);
+        lastUpdateMinsAgo = offlineMinutes
+        onlineCount.textContent = `Last update ${offlineMinutes}m ago`;
+    }
+}
+
 function updateStatus() {
-    fetch("/api/status")
-        .then(response => {
-            if (!response.ok) {
-                throw new Error(`HTTP error: ${response.status}`);
-            }
-            return response.json();
-        })
-        .then(data => {
-            const onlineCount = document.getElementById("online-count");
-            const statusLight = document.getElementById("nav-status-light");
-            lastStatusData = data;
+    if (streamConnected()) {    // Status is pushed by the stream instead
+        failureCount = 0;
+        return;
+    }
 
-            if (data.status === "ok") {
-                statusLight.dataset.state = "green";
-                onlineCount.textContent = `${data.online_players} player${data.online_players === 1 ? '' : 's'} online`;
-                failureCount = 0;
-            } else {
-                statusLight.dataset.state = "red";
-                const offlineMinutes = Math.max(data.last_players_update_age, data.last_kills_update_age);
-                lastUpdateMinsAgo = offlineMinutes
-                onlineCount.textContent = `Last update ${offlineMinutes}m ago`;
-            }
-        })
+    fetchJSON("/api/status")
+        .then(({ data }) => renderStatus(data))
         .catch(error => {
             failureCount += 1;
 
@@ -69,6 +70,7 @@ function updateStatus() {
 }
 updateStatus();
 setInterval(updateStatus, 2000);
+onStreamEvent("status", renderStatus);
 
 // Add an alert() to the status div (mainly used on mobile when there is no status text)
 document.getElementById("nav-online-players").addEventListener("click", () => {
@@ -63,6 +63,10 @@ function handleScroll() {
 
     const isAtBottom = Math.abs(killFeed.scrollHeight - killFeed.scrollTop - killFeed.clientHeight) < 5;
 
+    if (killFeed.scrollTop < 200) {
+        loadOlderKills();
+    }
+
     if (isAtBottom) {
         autoScrollEnabled = true;
         if (scrollToBottomButton) {
@@ -94,7 +98,7 @@ window.addEventListener("load", () => {
 const updateRate = 10_000;
 
 class Kill {
-    constructor(id, killer_uuid, killer_name, victim_uuid, victim_name, death_message, weapon_json, timestamp  ) {
+    constructor(id, killer_uuid, killer_name, victim_uuid, victim_name, death_message, weapon_json, timestamp, killer_skin_hash, victim_skin_hash) {
         /** @type {number} */
         this.id = id;
         /** @type {string} */
@@ -114,16 +118,16 @@ class Kill {
         /** @type {string} */
         this.formatted_timestamp = formatEpochTime(timestamp);
 
-        this.killer_skin_obj = getPlayerSkin(killer_uuid);
-        this.victim_skin_obj = getPlayerSkin(victim_uuid);
+        this.killer_skin_obj = getPlayerSkin(killer_uuid, killer_skin_hash);
+        this.victim_skin_obj = getPlayerSkin(victim_uuid, victim_skin_hash);
         // not implemented yet this.weapon_img = getWeaponImgObj(weapon_json);
     }
 }
 
-function getPlayerSkin(uuid) {
+function getPlayerSkin(uuid, skin_hash) {
     const playerSkin = document.createElement("img");
     playerSkin.className = "player-skin";
-    playerSkin.src = "/api/player_skin/" + uuid;
+    playerSkin.src = skinUrl("body", uuid, skin_hash);
 
     return playerSkin;
 }
@@ -221,7 +225,7 @@ function getWeaponImgObj(weapon_json) {
 // --- MESSAGE UPDATES ---
 
 // --- KILLS ---
-function addKill(killObj) {
+function addKill(killObj, prepend = false) {
     const killFeed = document.getElementsByClassName("kill-feed");  // Main kill container
 
     // Create the main kill container
@@ -290,7 +294,11 @@ function addKill(killObj) {
 
     
 
-    // NOTE: if we add the ability to fetch older messages, we can't just append to the top
+    // Older kills go above the oldest one shown, but below the "No kills found" message
+    if (prepend) {
+        killFeed[0].insertBefore(killContainer, killFeed[0].querySelector(".kill-container"));
+        return;
+    }
     killFeed[0].appendChild(killContainer);
 
 
@@ -299,6 +307,54 @@ function addKill(killObj) {
     }
 }
 
+
+// --- OLDER KILLS ---
+// Loads the page of kills before the oldest one shown, when scrolled near the top
+const olderKillsPageSize = 50;
+let loadingOlderKills = false;
+let reachedOldestKill = false;
+
+async function loadOlderKills() {
+    if (loadingOlderKills || reachedOldestKill || firstLoad) return;
+
+    const oldestKill = document.querySelector(".kill-feed .kill-container");
+    if (!oldestKill) return;
+
+    loadingOlderKills = true;
+    try {
+        const response = await fetch(`/api/kill_history?oldest_kill_id=${oldestKill.id}&limit=${olderKillsPageSize}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error: ${response.status}`);
+        }
+        const data = await response.json();
+
+        if (data.length < olderKillsPageSize) {
+            reachedOldestKill = true;
+        }
+
+        // Keep the kills the user is looking at in the same place on screen
+        const killFeed = document.querySelector(".kill-feed");
+        const previousHeight = killFeed.scrollHeight;
+
+        // Newest first, as each one goes on top
+        for (const kill of data.reverse()) {
+            addKill(new Kill(
+                kill.id,
+                kill.killer_uuid, kill.killer_name,
+                kill.victim_uuid, kill.victim_name,
+                kill.death_message, kill.weapon_json,
+                kill.timestamp,
+                kill.killer_skin_hash, kill.victim_skin_hash
+            ), true);
+        }
+        killFeed.scrollTop += killFeed.scrollHeight - previousHeight;
+    } catch (error) {
+        console.error("Failed to load older kills:", error);
+    } finally {
+        loadingOlderKills = false;
+    }
+}
+
 let firstLoad = true;
 function getNewKills() {
     const processKills = (kills) => {
@@ -315,7 +371,10 @@ function getNewKills() {
                 kill.death_message,
                 kill.weapon_json,
 
-                kill.timestamp
+                kill.timestamp,
+
+                kill.killer_skin_hash,
+                kill.victim_skin_hash
             ));
         }
     };
@@ -331,20 +390,44 @@ function getNewKills() {
                 processKills(data);
                 firstLoad = false;
             });
-    } else {    // Standard update, get kills newer than the most recent kill  (limited to 50 kills) 
+    } else if (!streamConnected()) {    // Standard update, get kills newer than the most recent kill  (limited to 50 kills) 
         const kills = document.getElementsByClassName("kill-container");
         const newestKillID = kills[kills.length - 1]?.id;
 
-        fetch(`/api/kill_history?newest_kill_id=${newestKillID}`)
-            .then(response => response.json())
-            .then(data => {
-                processKills(data);
+        fetchJSON(`/api/kill_history?newest_kill_id=${newestKillID}`)
+            .then(({ data, changed }) => {
+                if (changed) processKills(data);
             });
     }
 }
 getNewKills();
 setInterval(getNewKills, updateRate);
 
+// New kills pushed by the stream. Checked against the newest kill shown, in case a poll already added them
+onStreamEvent("kills", (newKills) => {
+    if (firstLoad) return;  // The first load will include them
+
+    const kills = document.getElementsByClassName("kill-container");
+    const newestKillID = Number(kills[kills.length - 1]?.id ?? 0);
+
+    for (const kill of newKills) {
+        if (kill.id > newestKillID) {
+            addKill(new Kill(
+                kill.id,
+                kill.killer_uuid, kill.killer_name,
+                kill.victim_uuid, kill.victim_name,
+                kill.death_message, kill.weapon_json,
+                kill.timestamp,
+                kill.killer_skin_hash, kill.victim_skin_hash
+            ));
+        }
+    }
+    updateInfoBubbles();
+});
+onStreamOpen(() => {
+    if (!firstLoad) getNewKills();
+});
+
 
 
 // --- CONTENT UPDATES ---
@@ -371,9 +454,8 @@ function updateInfoBubbles() {
     const uniqueKillers = document.getElementById("unique-killers");
     const uniqueVictims = document.getElementById("unique-victims");
 
-    fetch("/api/kills_misc")
-        .then(response => response.json())
-        .then(data => {
+    fetchJSON("/api/kills_misc")
+        .then(({ data }) => {
             killsCount.innerHTML = data.total_kills.toString();
             uniqueKillers.innerHTML = data.unique_killers.toString();
             uniqueVictims.innerHTML = data.unique_victims.toString();
@@ -381,4 +463,6 @@ function updateInfoBubbles() {
     
 }
 updateInfoBubbles();
-setInterval(updateInfoBubbles, updateRate);
+setInterval(() => {
+    if (!streamConnected()) updateInfoBubbles();    // Otherwise refreshed when the stream sends kills
+}, updateRate);
@@ -40,10 +40,10 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 });
 
-function getPlayerSkinObj(sender_uuid) {
+function getPlayerSkinObj(sender_uuid, skin_hash) {
     const profilePic = document.createElement("img");
     profilePic.className = "player-skin";
-    profilePic.src = "/api/player_skin/" + sender_uuid;
+    profilePic.src = skinUrl("body", sender_uuid, skin_hash);
     profilePic.alt = "Player skin";
 
     return profilePic;
@@ -89,7 +89,8 @@ class Player {
         uuid, name, 
         online_duration, afk_duration, 
         first_joined, bio,
-        last_online, status) {
+        last_online, status,
+        skin_hash) {
         
         this.uuid = uuid;
         this.name = name;
@@ -99,9 +100,10 @@ class Player {
         this.first_joined = first_joined;
         this.last_online = last_online;
         this.status = status;
+        this.skin_hash = skin_hash;
     
         this.text_status = getStatusText(this);
-        this.playerSkin = getPlayerSkinObj(this.uuid);
+        this.playerSkin = getPlayerSkinObj(this.uuid, this.skin_hash);
     }
 }
 
@@ -187,30 +189,64 @@ function addPlayerCard(playerObj) {
 // --- PLAYER UPDATES --- 
 const updateRate = 10_000;
 
+// Player data from the API by UUID, so changes from the stream and `?since=` can be applied to it
+const playerData = new Map();
+let playersVersion = null;
+
 async function getPlayers() {
-    const players = [];
+    // First load gets every player, after that only the ones that changed since the last version we got
+    let changed = false;
     try {
-        const response = await fetch("/api/players");
-        const data = await response.json();
-
-        data.forEach(player => {
-            const playerObj = new Player(
-                player.uuid, player.name, 
-                player.online_duration, player.afk_duration, 
-                player.first_joined, player.bio,  
-                player.last_online, player.status
-            );
-            players.push(playerObj);
-        });
+        const since = playersVersion === null ? "" : `&since=${playersVersion}`;
+        let page = 1;
+        let version = null;
+
+        while (page !== null) {
+            const response = await fetch(`/api/players?per_page=500&page=${page}${since}`);
+            if (!response.ok) {
+                throw new Error(`HTTP error: ${response.status}`);
+            }
+            const data = await response.json();
+
+            data.players.forEach(player => playerData.set(player.uuid, player));
+            data.removed.forEach(uuid => playerData.delete(uuid));
+            changed = changed || data.players.length > 0 || data.removed.length > 0;
 
+            version = version ?? data.version;     // The first page's, so nothing between pages is skipped next time
+            page = data.next_page;
+        }
+        playersVersion = version;
     } catch (error) {
         console.error("Failed to fetch players:", error);
     }
-    return players;
+    return changed;
+}
+
+async function updatePlayers(onlyIfChanged = false) {
+    if (onlyIfChanged && streamConnected()) {   // Changes are pushed by the stream instead
+        return;
+    }
+
+    const changed = await getPlayers();
+
+    // The delta since the last version was empty (no changed or removed players), so don't rebuild every card
+    if (onlyIfChanged && !changed) {
+        return;
+    }
+    renderPlayers();
 }
 
-async function updatePlayers() {
-    const players = await getPlayers();
+function renderPlayers() {
+    const players = [];
+    playerData.forEach(player => {
+        players.push(new Player(
+            player.uuid, player.name, 
+            player.online_duration, player.afk_duration, 
+            player.first_joined, player.bio,  
+            player.last_online, player.status,
+            player.skin_hash
+        ));
+    });
 
     // Prevent clearing the player grid if the call fails
     if (players.length === 0) {
@@ -240,7 +276,18 @@ async function updatePlayers() {
     });
 }
 updatePlayers();
-setInterval(updatePlayers, updateRate);
+setInterval(() => updatePlayers(true), updateRate);
+
+onStreamEvent("players", (diff) => {
+    if (playerData.size === 0) return;  // Still loading, the first fetch will have it
+
+    diff.changed.forEach(player => playerData.set(player.uuid, player));
+    diff.removed.forEach(uuid => playerData.delete(uuid));
+    renderPlayers();
+});
+onStreamOpen(async () => {   // Catch up on anything missed while disconnected
+    if (await getPlayers()) renderPlayers();
+});
 
 
 
@@ -249,9 +296,8 @@ function updateInfoBubbles() {
     const activeCountBubble = document.getElementById("active-count");
     const totalPlayersBubble = document.getElementById("total-count");
 
-    fetch("/api/players_misc")
-        .then(response => response.json())
-        .then(data => {
+    fetchJSON("/api/players_misc")
+        .then(({ data }) => {
             activeCountBubble.innerHTML = data.active_players.toLocaleString();
             totalPlayersBubble.innerHTML = data.total_players.toLocaleString();
         });
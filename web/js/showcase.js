@@ -1,62 +1,133 @@
+// Cards are at most about half the page wide, or the whole page below 950px (see showcase.css)
+const photoSizes = "(max-width: 950px) 100vw, 50vw";
+
+function createPhotoImage(item) {
+    const photoImage = document.createElement("img");
+    photoImage.alt = item.photo_title;
+    photoImage.className = "photo-image";
+    photoImage.loading = "lazy";
+
+    if (!item.variants) {   // Not processed yet, so only the original
+        photoImage.src = `/api/showcase_img/${item.img_src}`;
+        return photoImage;
+    }
+
+    // So the card has the right height before the image loads, and the thumbnail shows while it does
+    photoImage.width = item.width;
+    photoImage.height = item.height;
+    photoImage.style.backgroundImage = `url("${item.thumb}")`;
+
+    const srcset = format => item.variants.map(variant => `${variant[format]} ${variant.width}w`).join(", ");
+
+    photoImage.srcset = srcset("webp");
+    photoImage.sizes = photoSizes;
+    photoImage.src = (item.variants.find(variant => variant.width >= 960) || item.variants[item.variants.length - 1]).webp;
+
+    if (!item.variants[0].avif) {
+        return photoImage;
+    }
+
+    // Browsers that can show AVIF pick it, the rest use the WebP `srcset` above
+    const picture = document.createElement("picture");
+    const avifSource = document.createElement("source");
+    avifSource.type = "image/avif";
+    avifSource.srcset = srcset("avif");
+    avifSource.sizes = photoSizes;
+
+    picture.appendChild(avifSource);
+    picture.appendChild(photoImage);
+
+    return picture;
+}
+
+function createPhotoCard(item) {
+    const photoCard = document.createElement("div");
+    photoCard.className = "photo-card";
+
+    // Image
+    const photoImage = createPhotoImage(item);
+
+    // Info
+    const photoInfo = document.createElement("div");
+    photoInfo.className = "photo-info";
+
+    const photoTitle = document.createElement("h3");
+    photoTitle.className = "photo-title";
+    photoTitle.textContent = item.photo_title;
+
+    const photoDetails = document.createElement("p");
+    photoDetails.className = "photo-details";
+
+    const formattedDate = new Date(`${item.photo_date}T00:00:00`).toLocaleDateString(undefined, {
+        month: "long",
+        day: "numeric",
+        year: "numeric"
+    });
+
+    photoDetails.innerHTML = `<span id="info-date">${formattedDate}</span> by <span id="info-photographer">${item.photographer}</span>`;
+
+
+    photoInfo.appendChild(photoTitle);
+    photoInfo.appendChild(photoDetails);
+    photoCard.appendChild(photoImage);
+    photoCard.appendChild(photoInfo);
+
+    return photoCard;
+}
+
+
+// The gallery is loaded a page at a time as you scroll, newest first (the server sorts them by date)
+const photosPerPage = 12;
+let nextPage = 1;
+let loadingPage = false;
+
+// Returns false if it failed
+async function loadNextPage(showcaseGrid) {
+    if (loadingPage || nextPage === null) return true;
+    loadingPage = true;
+
+    try {
+        const response = await fetch(`/api/showcase_manifest?page=${nextPage}&per_page=${photosPerPage}`);
+        if (!response.ok) {
+            throw new Error("Failed to fetch showcase data");
+        }
+        const data = await response.json();
+
+        if (nextPage === 1) {
+            showcaseGrid.innerHTML = "";
+        }
+        data.photos.forEach(item => showcaseGrid.appendChild(createPhotoCard(item)));
+
+        nextPage = data.next_page;
+        return true;
+    } catch (error) {
+        console.error("Failed to fetch showcase data:", error);
+        return false;
+    } finally {
+        loadingPage = false;
+    }
+}
+
 document.addEventListener("DOMContentLoaded", () => {
     const showcaseGrid = document.querySelector(".showcase-grid");
 
-    fetch("/api/showcase_manifest")
-        .then(response => {
-            if (!response.ok) {
-                throw new Error("Failed to fetch showcase data");
-            }
-            return response.json();
-        })
-        .then(data => {
-            showcaseGrid.innerHTML = "";
+    // Loads the next page when the end of the gallery gets close to being on screen
+    const sentinel = document.createElement("div");
+    showcaseGrid.after(sentinel);
+
+    const observer = new IntersectionObserver(async entries => {
+        if (!entries[0].isIntersecting) return;
+
+        const loaded = await loadNextPage(showcaseGrid);
+
+        if (!loaded || nextPage === null) {  // Not retried on errors, so a broken API doesn't get hammered
+            observer.disconnect();
+        } else {
+            // Observing again checks it straight away, in case one page wasn't enough to push it off screen
+            observer.unobserve(sentinel);
+            observer.observe(sentinel);
+        }
+    }, { rootMargin: "1000px" });
 
-            // In the image manifest, we might not sort the images by date, so we need to sort them here.
-            // Sorts by date in descending order
-            data.sort((a, b) => {
-                return new Date(b.photo_date) - new Date(a.photo_date);
-            });
-
-            data.forEach(item => {
-                // Create a photo card for each item
-                const photoCard = document.createElement("div");
-                photoCard.className = "photo-card";
-
-                // Image
-                const photoImage = document.createElement("img");
-                photoImage.src = `/api/showcase_img/${item.img_src}`;
-                photoImage.alt = item.photo_title;
-                photoImage.className = "photo-image";
-
-                // Info
-                const photoInfo = document.createElement("div");
-                photoInfo.className = "photo-info";
-
-                const photoTitle = document.createElement("h3");
-                photoTitle.className = "photo-title";
-                photoTitle.textContent = item.photo_title;
-
-                const photoDetails = document.createElement("p");
-                photoDetails.className = "photo-details";
-
-                const formattedDate = new Date(`${item.photo_date}T00:00:00`).toLocaleDateString(undefined, {
-                    month: "long",
-                    day: "numeric",
-                    year: "numeric"
-                });
-
-                photoDetails.innerHTML = `<span id="info-date">${formattedDate}</span> by <span id="info-photographer">${item.photographer}</span>`;
-
-
-                photoInfo.appendChild(photoTitle);
-                photoInfo.appendChild(photoDetails);
-                photoCard.appendChild(photoImage);
-                photoCard.appendChild(photoInfo);
-
-                showcaseGrid.appendChild(photoCard);
-            });
-        })
-        .catch(error => {
-            console.error("Failed to fetch showcase data:", error);
-        });
+    observer.observe(sentinel);
 });
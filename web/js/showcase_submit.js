@@ -34,7 +34,7 @@ document.addEventListener("DOMContentLoaded", () => {
                 form.reset();
             } else {
                 return response.json().then(data => {
-                    throw new Error(data.message || "Failed to submit your photo. Please try again later.");
+                    throw new Error(data.error || data.message || "Failed to submit your photo. Please try again later.");
                 });
             }
         })
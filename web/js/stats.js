@@ -22,12 +22,12 @@ async function fetchLeaderboard() {
 
         let response;
         if (statType === "0") {
-            response = await fetch(`/api/get_general_leaderboard/${stat.value}`);
+            response = await fetchJSON(`/api/get_general_leaderboard/${stat.value}`);
         } else if (statType === "1") {
-            response = await fetch(`/api/get_custom_stat/${stat.value}`);
+            response = await fetchJSON(`/api/get_custom_stat/${stat.value}`);
         }
 
-        const data = await response.json();
+        const data = response.data;
         
         const entries = data.leaderboard.map((entry, index) => {
             return new StatEntry(
@@ -40,7 +40,8 @@ async function fetchLeaderboard() {
 
         return {
             entries: entries,
-            units: data.units
+            units: data.units,
+            changed: response.changed
         };
 
     } catch (error) {
@@ -49,6 +50,39 @@ async function fetchLeaderboard() {
     }
 }
 
+// Every face in one image, instead of a request per player. See `/api/face_atlas`
+let faceAtlas = null;
+
+async function fetchFaceAtlas() {
+    try {
+        const response = await fetchJSON("/api/face_atlas");
+        faceAtlas = response.data;
+
+        return response.changed;
+    } catch (error) {
+        console.error(error);   // Faces just get loaded one by one instead
+        return false;
+    }
+}
+
+function faceHTML(uuid) {
+    const offset = faceAtlas ? faceAtlas.faces[uuid] : undefined;
+    if (!offset) {  // New players aren't in the atlas until the updater rebuilds it
+        return `<img class="player-face" src="${skinUrl("face", uuid)}">`;
+    }
+
+    // In percentages, so it scales to whatever size the CSS gives `.player-face`
+    const { size, width, height } = faceAtlas;
+    const x = width > size ? offset[0] / (width - size) * 100 : 0;
+    const y = height > size ? offset[1] / (height - size) * 100 : 0;
+
+    return `<span class="player-face face-sprite" style="
+        background-image: url('${faceAtlas.image}');
+        background-size: ${width / size * 100}% ${height / size * 100}%;
+        background-position: ${x}% ${y}%;
+    "></span>`;
+}
+
 function sortLeaderboard(data, sortMethod) {
     const entriesCopy = [...data];  // Copy to avoid bunging the original data
 
@@ -103,7 +137,7 @@ function renderLeaderboard(data, unit, currentSort) {
 
         entryDiv.innerHTML = `
             <h3 class="player-rank">#${entry.rank}</h3>
-            <img class="player-face" src="/api/player_face/${entry.uuid}">
+            ${faceHTML(entry.uuid)}
             <h3 class="player-name">${entry.username}</h3>
             <h3 class="player-stat-value mono-font">${entry.value.toLocaleString()}</h3>
         `;
@@ -145,7 +179,7 @@ async function initializeLeaderboard() {
     }
 
     // Initial load
-    currentData = await fetchLeaderboard();
+    [currentData] = await Promise.all([fetchLeaderboard(), fetchFaceAtlas()]);
     if (currentData) {
         renderLeaderboard(currentData.entries, currentData.units, currentSort);
         updateUrlParams();
@@ -172,8 +206,11 @@ async function initializeLeaderboard() {
 
     // Periodic updates
     setInterval(async () => {
-        currentData = await fetchLeaderboard();
-        if (currentData) renderLeaderboard(currentData.entries, currentData.units, currentSort);
+        const [newData, atlasChanged] = await Promise.all([fetchLeaderboard(), fetchFaceAtlas()]);
+        if (newData && (newData.changed || atlasChanged)) {  // Skip re-rendering if the server sent 304s
+            currentData = newData;
+            renderLeaderboard(currentData.entries, currentData.units, currentSort);
+        }
     }, updateRate);
 }
 initializeLeaderboard();
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import threading
+import time
+
+from flask import Response, current_app
+
+from config import RESPONSE_CACHE_DIR
+from db import atlas_db
+from compression import choose_encoding, compress, compressed_response, MIN_SIZE
+
+try:
+    import fcntl    # Not on Windows, where workers just build their own copy
+except ImportError:
+    fcntl = None
+
+# Caches the serialized JSON of the polled endpoints, keyed on the data they were built from.
+#
+# The updaters stamp `last_players_update`, `last_kills_update` and `last_skins_update` in `variables` after every write,
+# and the stats updater stamps `leaderboards.updated` (see `get_leaderboards_version()` in stats_routes.py).
+# Until those change, a response can be sent as is.
+# Entries live in this worker's memory, and in `RESPONSE_CACHE_DIR` so the other gunicorn workers can
+# pick up a response one of them already built, instead of running the queries again.
+
+VERSION_TTL = 1     # Seconds the data versions are reused for, so a burst of requests only reads them once
+
+_versions = {}
+_versions_read = 0
+
+
+def get_data_versions() -> dict:
+    """
+    Returns the current version of each atlascivs.db data source, as the time it was last written in ms.
+    """
+    global _versions, _versions_read
+
+    if time.monotonic() - _versions_read > VERSION_TTL:
+        with atlas_db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT variable, value
+                FROM variables
+                WHERE variable IN ('last_players_update', 'last_kills_update', 'last_skins_update')
+            """)
+            versions = {variable: int(value) for variable, value in cursor.fetchall()}
+
+        _versions = versions
+        _versions_read = time.monotonic()
+
+    return _versions
+
+
+class ResponseCache:
+    """
+    `param cache_dir` Directory shared by every worker. One file per endpoint, overwritten as the data changes.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.entries = {}   # name: (key, body, etag)
+        self.compressed = {}    # name: (etag, {encoding: body}). Only in memory, compressing is quick next to building
+        self.locks = {}
+        self.locks_lock = threading.Lock()
+
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.file_hits = 0
+        self.misses = 0
+        self.compressions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _lock_for(self, name) -> threading.Lock:
+        with self.locks_lock:
+            return self.locks.setdefault(name, threading.Lock())
+
+    def _path(self, name) -> str:
+        return os.path.join(self.cache_dir, f"{name}.cache")
+
+    def _read_file(self, name, key: str):
+        # First line is the key the body was built for
+        try:
+            with open(self._path(name), "rb") as file:
+                if file.readline().rstrip(b"\n").decode() == key:
+                    return file.read()
+        except FileNotFoundError:
+            pass
+
+        return None
+
+    def _write_file(self, name, key: str, body: bytes) -> None:
+        tmp_path = f"{self._path(name)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(key.encode() + b"\n" + body)
+
+        os.replace(tmp_path, self._path(name))  # Other workers never see a half written file
+
+    def _count(self, counter) -> None:
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, name, key, build) -> tuple:
+        """
+        Returns the cached JSON body and its ETag for `name` if it was built for `key`,
+        otherwise builds, stores and returns them.
+
+        `param name` Endpoint name, also the cache file name.
+        `param key` Anything with a stable `repr`, usually a tuple of data versions.
+        `param build` Function returning the data to serialize, or an already serialized JSON string.
+        """
+        key = hashlib.sha1(repr(key).encode()).hexdigest()
+
+        entry = self.entries.get(name)
+        if entry and entry[0] == key:
+            self._count("memory_hits")
+            return entry[1], entry[2]
+
+        # One request per endpoint builds it, the rest wait for it instead of all running the queries
+        with self._lock_for(name):
+            entry = self.entries.get(name)
+            if entry and entry[0] == key:
+                self._count("memory_hits")
+                return entry[1], entry[2]
+
+            body = self._read_file(name, key)
+            if body is not None:
+                self._count("file_hits")
+            else:
+                body = self._build_shared(name, key, build)
+
+            # Hashed once here, rather than by `after_request` on every response
+            etag = hashlib.sha1(body).hexdigest()
+            self.entries[name] = (key, body, etag)
+
+            return body, etag
+
+    def _build_shared(self, name, key: str, build) -> bytes:
+        if fcntl is None:
+            return self._build(name, key, build)
+
+        # Hold a file lock while building, so the other workers wait for this one instead of building it too
+        with open(f"{self._path(name)}.lock", "wb") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                body = self._read_file(name, key)
+                if body is not None:
+                    self._count("file_hits")
+                    return body
+
+                return self._build(name, key, build)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _build(self, name, key: str, build) -> bytes:
+        self._count("misses")
+
+        data = build()
+        if not isinstance(data, str):
+            data = current_app.json.dumps(data, separators=(",", ":")) + "\n"  # Same as `jsonify` outside debug mode
+
+        body = data.encode()
+        self._write_file(name, key, body)
+
+        return body
+
+    def _compressed(self, name, body, etag, encoding) -> bytes:
+        compressed = self.compressed.get(name)
+        if compressed is None or compressed[0] != etag:
+            compressed = (etag, {})
+            self.compressed[name] = compressed
+
+        if encoding not in compressed[1]:   # Two requests might both compress it, but they'd come out the same
+            compressed[1][encoding] = compress(body, encoding)
+            self._count("compressions")
+
+        return compressed[1][encoding]
+
+    def response(self, name, key, build) -> Response:
+        body, etag = self.get(name, key, build)
+
+        encoding = choose_encoding()
+        if encoding and len(body) >= MIN_SIZE:
+            return compressed_response(self._compressed(name, body, etag, encoding), etag, encoding, "application/json")
+
+        response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+
+        return response
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "file_hits": self.file_hits,
+                "misses": self.misses,
+                "compressions": self.compressions,
+                "entries": len(self.entries)
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_DIR)
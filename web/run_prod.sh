@@ -1,2 +1,2 @@
 #!/bin/bash
-gunicorn --workers 4 --bind 0.0.0.0:1901 --name gunicorn_atlas atlas_webserver:app
\ No newline at end of file
+gunicorn --workers 4 --worker-class gevent --bind 0.0.0.0:1901 --name gunicorn_atlas atlas_webserver:app
\ No newline at end of file
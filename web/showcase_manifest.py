@@ -0,0 +1,148 @@
+import bisect
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config import SHOWCASE_IMAGES_DIR
+from showcase_processor import load_index, VARIANTS_DIR, VARIANTS_INDEX
+
+# The showcase manifest, loaded once per worker instead of on every request.
+#
+# Reloaded when the hand edited manifest or the updater's variants index change, going by their mtime and size.
+# Photos are kept sorted by date, with an index by photographer, so a page of a filtered gallery
+# doesn't have to look at every photo.
+
+MANIFEST_FILE = "showcase_manifest.json"
+CHECK_INTERVAL = 1  # Seconds between checking the files for changes, so a burst of requests only stats them once
+
+
+def variant_url(file_name):
+    return f"/api/showcase_img/{VARIANTS_DIR}/{file_name}"
+
+
+def date_key(photo_date) -> str:
+    """
+    `photo_date` as `YYYY-MM-DD`, so it sorts properly even if the manifest has `2024-8-8`.
+    """
+    try:
+        year, month, day = (int(part) for part in str(photo_date).split("-"))
+        return f"{year:04}-{month:02}-{day:02}"
+    except ValueError:
+        return "0000-00-00"     # Sorted as the oldest
+
+
+class ShowcaseManifest:
+    """
+    `param images_dir` Where the manifest, images and variants index are.
+    """
+
+    def __init__(self, images_dir):
+        self.images_dir = images_dir
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.file_versions = None
+
+        # (version, photos, dates, by_photographer). Swapped in all at once, so requests mid reload
+        # see either the old manifest or the new one.
+        # Photos are oldest first (see `page()`), dates are the `date_key()` of each photo for bisecting,
+        # and by_photographer is `{lowercase name: positions in photos, in order}`.
+        self.state = (None, [], [], {})
+
+    def _file_versions(self) -> tuple:
+        versions = []
+        for file_name in (MANIFEST_FILE, VARIANTS_INDEX):
+            try:
+                stat = os.stat(os.path.join(self.images_dir, file_name))
+                versions.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:   # The variants index won't exist until the updater has run
+                versions.append(None)
+
+        return tuple(versions)
+
+    def _refresh(self) -> None:
+        if time.monotonic() - self.checked < CHECK_INTERVAL:
+            return
+
+        with self.lock:
+            file_versions = self._file_versions()
+            self.checked = time.monotonic()
+
+            if file_versions != self.file_versions:
+                self._load(hashlib.sha1(repr(file_versions).encode()).hexdigest()[:16])
+                self.file_versions = file_versions
+
+    def _load(self, version) -> None:
+        with open(os.path.join(self.images_dir, MANIFEST_FILE), "r") as file:
+            manifest = json.load(file)
+
+        # Images the updater hasn't processed yet just don't have `variants`, the gallery falls back to the original
+        index = load_index(self.images_dir)
+        for photo in manifest:
+            processed = index.get(photo.get("img_src"))
+            if not processed or processed.get("failed"):
+                continue
+
+            photo["width"], photo["height"] = processed["width"], processed["height"]
+            photo["thumb"] = variant_url(processed["thumb"])
+            photo["variants"] = [
+                {format: value if format == "width" else variant_url(value) for format, value in variant.items()}
+                for variant in processed["variants"]
+            ]
+
+        photos = sorted(manifest, key=lambda photo: (date_key(photo.get("photo_date")), photo.get("photo_title", "")))
+
+        by_photographer = {}
+        for position, photo in enumerate(photos):
+            by_photographer.setdefault(str(photo.get("photographer", "")).lower(), []).append(position)
+
+        self.state = (version, photos, [date_key(photo.get("photo_date")) for photo in photos], by_photographer)
+
+    @property
+    def version(self) -> str:
+        self._refresh()
+
+        return self.state[0]
+
+    def all(self) -> list:
+        """
+        Every photo, newest first.
+        """
+        self._refresh()
+
+        return self.state[1][::-1]
+
+    def page(self, page=1, per_page=24, photographer=None, date_from=None, date_to=None) -> dict:
+        """
+        One page of photos, newest first.
+
+        `param photographer` Only their photos, case insensitive.
+        `param date_from` and `param date_to` Only photos from these dates, inclusive. `YYYY-MM-DD`.
+
+        Returns `{"version", "total", "photos", "next_page"}`.
+        """
+        self._refresh()
+        version, photos, dates, by_photographer = self.state
+
+        positions = range(len(photos))
+        if photographer is not None:
+            positions = by_photographer.get(photographer.lower(), [])
+
+        # Positions are in date order, so the date range is a slice of them
+        first = bisect.bisect_left(positions, bisect.bisect_left(dates, date_key(date_from)) if date_from else 0)
+        end = bisect.bisect_left(positions, bisect.bisect_right(dates, date_key(date_to)) if date_to else len(photos))
+
+        # Counting back from the newest
+        page_end = end - (page - 1) * per_page
+        page_start = max(first, page_end - per_page)
+
+        return {
+            "version": version,
+            "total": end - first,
+            "photos": [photos[position] for position in reversed(positions[page_start:page_end])] if page_end > first else [],
+            "next_page": page + 1 if page_start > first else None
+        }
+
+
+showcase_manifest = ShowcaseManifest(SHOWCASE_IMAGES_DIR)
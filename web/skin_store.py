@@ -0,0 +1,142 @@
+import functools
+import hashlib
+import json
+import threading
+
+from flask import Response, request
+
+from db import atlas_db
+from response_cache import get_data_versions
+from face_atlas import build_face_atlas
+
+# Player skins, served from memory.
+#
+# The updater stores the images in `skins.image` and bumps `last_skins_update` when any change.
+# Each worker keeps every image in memory (faces are ~160 bytes, bodies a few KB), and only loads
+# the rows that changed since it last looked.
+# Pages ask for `?v=<hash of that image>` (see `skinUrl()` in api.js), sent along with the players and kills,
+# so while it's current the browser can keep the image for good without asking again. One skin changing
+# only changes its own URL. The same goes for the face atlas, which the updater builds from every face.
+# Atlases of only some players are built here on request.
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+URL_HASH_LENGTH = 16    # Characters of the hash put in URLs
+
+
+def url_hash(content_hash) -> str:
+    return content_hash[:URL_HASH_LENGTH]
+
+
+def skin_hash_sql(uuid_column, type) -> str:
+    """
+    SQL for a player's current `url_hash()` of their `type` skin, to send along with them. `NULL` if there isn't one.
+    `param uuid_column` The column with their UUID.
+    """
+    return f"""(
+        SELECT substr(content_hash, 1, {URL_HASH_LENGTH})
+        FROM skins
+        WHERE skins.uuid = {uuid_column} AND skins.type = '{type}' AND skins.image IS NOT NULL
+    )"""
+
+
+class SkinStore:
+    def __init__(self):
+        self.images = {}        # (type, uuid): (content hash, image)
+        self.lock = threading.Lock()
+        self.version = None     # `last_skins_update` the images were loaded for. Only to know when to reload, not for URLs
+        self.last_changed = 0   # Newest `changed_at` loaded
+        self.atlas = None       # (ETag, PNG, offset map) of every face
+
+    def _refresh(self) -> None:
+        version = get_data_versions().get("last_skins_update", 0)
+        if version == self.version:
+            return
+
+        with self.lock:
+            if version == self.version:
+                return
+
+            with atlas_db.connection() as conn:
+                cursor = conn.cursor()
+                # Stamped in commit order by the updater (see `next_skins_version()`), so nothing older can turn up later
+                cursor.execute("""
+                    SELECT uuid, type, content_hash, image, changed_at
+                    FROM skins
+                    WHERE changed_at >= ? AND image IS NOT NULL
+                """, (self.last_changed,))
+
+                for uuid, type, content_hash, image, changed_at in cursor.fetchall():
+                    self.images[(type, uuid)] = (content_hash, image)
+                    self.last_changed = max(self.last_changed, changed_at)
+
+                cursor.execute("SELECT image, offsets FROM face_atlas WHERE id = 1")
+                atlas = cursor.fetchone()
+                if atlas is not None:
+                    self.atlas = (hashlib.sha1(atlas[0]).hexdigest(), atlas[0], json.loads(atlas[1]))
+
+            self.version = version
+
+    def get(self, type, uuid) -> tuple:
+        """
+        Returns `(content hash, image)`, or `None` if there isn't a skin for them.
+        """
+        self._refresh()
+
+        return self.images.get((type, uuid))
+
+    def face_atlas(self, uuids=None) -> tuple:
+        """
+        Returns `(ETag, PNG, offset map)` of every face, or only the faces of `uuids`, in that order.
+        `None` if the updater hasn't built the full atlas yet.
+        """
+        self._refresh()
+
+        if uuids is None:
+            return self.atlas
+
+        return self._build_atlas(self.version, tuple(uuids))
+
+    @functools.lru_cache(maxsize=32)
+    def _build_atlas(self, version, uuids) -> tuple:
+        # `version` is only part of the cache key, so atlases are rebuilt once the skins change
+        faces = [(uuid, self.images[("face", uuid)][1]) for uuid in uuids if ("face", uuid) in self.images]
+        image, offsets = build_face_atlas(faces)
+
+        return hashlib.sha1(image).hexdigest(), image, offsets
+
+    def response(self, type, uuid) -> Response:
+        """
+        The image as a PNG response, or `None` if there isn't one.
+        """
+        skin = self.get(type, uuid)
+        if skin is None:
+            return None
+
+        content_hash, image = skin
+
+        return self.png_response(image, content_hash)
+
+    def png_response(self, image, etag) -> Response:
+        """
+        Immutable if the request's `v` is this image's `url_hash()`, otherwise revalidated with the ETag.
+        """
+        response = Response(image, mimetype="image/png")
+        response.set_etag(etag)
+
+        if request.args.get("v") == url_hash(etag):
+            response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+
+        return response.make_conditional(request)
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "images": len(self.images),
+            "atlas_bytes": len(self.atlas[1]) if self.atlas else 0,
+            "bytes": sum(len(image) for _, image in self.images.values())
+        }
+
+
+skin_store = SkinStore()
@@ -1,6 +1,5 @@
 from flask import Blueprint, jsonify, send_from_directory, request
 from werkzeug.exceptions import NotFound
-import sqlite3
 import traceback
 import time
 import bleach
@@ -8,51 +7,53 @@ import os
 import json
 import uuid
 
-from config import log, ATLAS_DB_FILE, STATS_DB_FILE, PLAYER_FACE_SKIN_DIR
+from config import log
+from db import stats_db
+from response_cache import response_cache, VERSION_TTL
+from stat_history import get_history, DAY_MS
+from leaderboards import AVAILABLE_GENERAL_STATS, AVAILABLE_CUSTOM_STATS, get_leaderboard
 
 stats_routes = Blueprint("stats_blueprint", __name__)
 
 
-# Helper functions
-def count(count):
-    return int(count), "quantity"
+# Leaderboards are ranked by the stats updater, these just send the stored JSON. See `leaderboards.py`
+_leaderboards_version = 0
+_leaderboards_version_read = 0
 
-def ticks_to_hours(ticks):
-    return f"{ticks / 20 / 60 / 60:.1f}", "hours"
+def get_leaderboards_version() -> int:
+    """
+    When any leaderboard last changed in ms, reused for `VERSION_TTL` like `get_data_versions()`.
+    Kept apart from that, so the atlascivs.db endpoints still work without the stats DB.
+    """
+    global _leaderboards_version, _leaderboards_version_read
 
-def cm_to_km(cm):
-    return f"{cm / 100_000:.3f}", "kilometers"
+    if time.monotonic() - _leaderboards_version_read > VERSION_TTL:
+        with stats_db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(MAX(updated), 0) FROM leaderboards")
+            _leaderboards_version = cursor.fetchone()[0]
 
-def get_name(uuid):
-    with sqlite3.connect(ATLAS_DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""SELECT name FROM players WHERE uuid = ?""", (uuid,))
-        name = cursor.fetchone()
-        name = name[0] if name else "Unknown"
+        _leaderboards_version_read = time.monotonic()
 
-    return name
+    return _leaderboards_version
 
+def send_leaderboard(kind, stat):
+    def build():
+        with stats_db.connection() as conn:
+            leaderboard = get_leaderboard(conn.cursor(), kind, stat)
 
+        if leaderboard is None:     # Stats updater hasn't built it yet
+            return {"units": None, "leaderboard": []}
 
-# General stats
-# This lists queryable stats, and what translation to use for the result. The comments are what appears in game.
-# Note that this is kind of goofy. You will call for a stat key, but the result will be translated into different units.
-AVAILABLE_GENERAL_STATS = {
-    # Key, (stat translation function)
-    "DEATHS": count,                        # Number of deaths
-    "TIME_SINCE_DEATH": ticks_to_hours,     # Time since last death
-    "PLAYER_KILLS": count,                  # Player kills
-    "TOTAL_WORLD_TIME": ticks_to_hours,     # Time played
-    "PIG_ONE_CM": cm_to_km,                 # Distance by pig
-    "ANIMALS_BRED": count,                  # Animals bred
-    "CAKE_SLICES_EATEN": count,             # Cake slices eaten
-    "CRAFTING_TABLE_INTERACTION": count,    # Interactions with crafting table
-    "TRADED_WITH_VILLAGER": count,          # Traded with villagers
-    "SLEEP_IN_BED": count,                  # Times slept in a bed
-    "FISH_CAUGHT": count                    # Fish caught
-}
+        _, leaderboard_json = leaderboard
+        return leaderboard_json
+
+    key = get_leaderboards_version()
+
+    return response_cache.response(f"{kind}_leaderboard_{stat}", key, build), 200
 
 
+# General stats
 @stats_routes.route("/api/get_general_leaderboard/<stat>")
 def get_stats_leaderboard(stat):
     try:
@@ -60,45 +61,7 @@ def get_stats_leaderboard(stat):
         if stat not in AVAILABLE_GENERAL_STATS:
             return {"error": "invalid stat key"}, 400
 
-        stat_translation = AVAILABLE_GENERAL_STATS[stat]
-
-        # We should really join the stats.db and teaw.db into one database
-        with sqlite3.connect(STATS_DB_FILE) as stats_conn, sqlite3.connect(ATLAS_DB_FILE) as teaw_conn:
-            stats_cursor = stats_conn.cursor()
-            teaw_cursor = teaw_conn.cursor()
-
-            # Query the stats leaderboard
-            stats_cursor.execute("""
-                SELECT player_uuid, stat_value
-                FROM player_statistics
-                WHERE category = 'general' AND stat_key = ?
-                ORDER BY stat_value DESC
-                LIMIT 500
-            """, (stat,))
-
-            leaderboard = []
-            units = None
-            for row in stats_cursor.fetchall():
-                player_uuid, stat_value = row
-                translated_value, stat_unit = stat_translation(stat_value)
-                units = stat_unit
-
-                # Get the player name from the teaw.db players table
-                teaw_cursor.execute("""
-                    SELECT name
-                    FROM players
-                    WHERE uuid = ?
-                """, (player_uuid,))
-                player_name = teaw_cursor.fetchone()
-                player_name = player_name[0] if player_name else "Unknown"
-
-                leaderboard.append({
-                    "uuid": player_uuid,
-                    "name": player_name,
-                    "value": translated_value
-                })
-
-        return jsonify({"units": units, "leaderboard": leaderboard}), 200
+        return send_leaderboard("general", stat)
     except Exception:
         log.error(f"Internal error getting `stats_leaderboard` for stat '{stat}': {traceback.format_exc()}")
         return {"error": "internal error"}, 500
@@ -106,79 +69,48 @@ def get_stats_leaderboard(stat):
 
 
 # Custom stats
-def get_playtime_death_ratio():
+@stats_routes.route("/api/get_custom_stat/<stat>")
+def handle_custom_stat(stat):
     try:
-        with sqlite3.connect(STATS_DB_FILE) as stats_conn, sqlite3.connect(ATLAS_DB_FILE) as teaw_conn:
-            stats_cursor = stats_conn.cursor()
-            teaw_cursor = teaw_conn.cursor()
-            
-            stats_cursor.execute("""
-                SELECT p1.player_uuid, 
-                       CAST(p1.stat_value AS FLOAT) as playtime, 
-                       CAST(COALESCE(p2.stat_value, 0) AS FLOAT) as deaths
-                FROM player_statistics p1
-                LEFT JOIN player_statistics p2 
-                    ON p1.player_uuid = p2.player_uuid 
-                    AND p2.category = 'general' 
-                    AND p2.stat_key = 'DEATHS'
-                WHERE p1.category = 'general' 
-                AND p1.stat_key = 'TOTAL_WORLD_TIME'
-            """)
-            
-            player_stats = []
-            for row in stats_cursor.fetchall():
-                player_uuid, playtime, deaths = row
-                
-                # Convert ticks to hours
-                hours = playtime / 20 / 60 / 60
-                
-                # If no deaths, ratio is just their playtime
-                if deaths == 0:
-                    ratio = hours  
-                else:
-                    ratio = hours / deaths
-                
-                # Get player name
-                teaw_cursor.execute("""
-                    SELECT name FROM players WHERE uuid = ?
-                """, (player_uuid,))
-                player_name = teaw_cursor.fetchone()
-                player_name = player_name[0] if player_name else "Unknown"
-                
-                player_stats.append({
-                    "uuid": player_uuid,
-                    "name": player_name,
-                    "value": f"{ratio:.1f}"
-                })
-            
-            player_stats.sort(key=lambda x: float(x["value"]), reverse=True)
-            
-            return player_stats
+        stat = stat.upper()
+        if stat not in AVAILABLE_CUSTOM_STATS:
+            return {"error": "invalid stat key"}, 400
+
+        return send_leaderboard("custom", stat)
     except Exception:
-        log.error(f"Error calculating playtime/death ratio: {traceback.format_exc()}")
-        return []
+        log.error(f"Internal error handling custom_stat for stat '{stat}': {traceback.format_exc()}")
+        return {"error": "internal error"}, 500
 
 
-AVAILABLE_CUSTOM_STATS = {
-    "PLAYTIME_DEATH_RATIO": (get_playtime_death_ratio, "avg. hours per death")
-}
 
-@stats_routes.route("/api/get_custom_stat/<stat>")
-def handle_custom_stat(stat):
+# Stat history
+@stats_routes.route("/api/stat_history/<uuid>/<stat>")
+def get_stat_history(uuid, stat):
+    """
+    Returns how a player's stat changed over time. The resolution (raw, hourly or daily)
+    is picked from the requested range, see `stat_history.py`.
+
+    Query args: `category` (default `general`), `start` and `end` in ms (default the last 7 days).
+    """
     try:
         stat = stat.upper()
-        if stat not in AVAILABLE_CUSTOM_STATS:
-            return {"error": "invalid stat key"}, 400
+        category = request.args.get("category", "general")
+        end = request.args.get("end", int(time.time() * 1000), type=int)
+        start = request.args.get("start", end - 7 * DAY_MS, type=int)
+
+        if start > end:
+            return {"error": "invalid request: start is after end"}, 400
 
-        stat_function, units = AVAILABLE_CUSTOM_STATS[stat]
-        
-        leaderboard = stat_function()
+        with stats_db.connection() as conn:
+            resolution, points = get_history(conn.cursor(), uuid, category, stat, start, end)
 
         return jsonify({
-            "units": units,
-            "leaderboard": leaderboard
+            "resolution": resolution,
+            "points": [
+                {"timestamp": timestamp, "value": stat_value, "delta": delta}
+                for timestamp, stat_value, delta in points
+            ]
         }), 200
-
     except Exception:
-        log.error(f"Internal error handling custom_stat for stat '{stat}': {traceback.format_exc()}")
+        log.error(f"Internal error getting `stat_history` for stat '{stat}': {traceback.format_exc()}")
         return {"error": "internal error"}, 500
@@ -0,0 +1,183 @@
+from flask import Blueprint, Response
+import sqlite3
+import traceback
+import threading
+import queue
+import json
+import time
+
+from config import log
+from db import atlas_db
+from api_routes import build_players, build_status, KILL_COLUMNS
+
+stream_routes = Blueprint("stream_blueprint", __name__)
+
+
+# Live updates
+# Instead of every open tab polling, one hub per worker watches atlascivs.db for commits from the
+# updater, works out what changed, and pushes it to every connected `/api/stream` client.
+# Needs an async worker class (see run_prod.sh), as every client holds a connection open.
+
+POLL_INTERVAL = 0.5         # Seconds between checking if the updater committed anything
+STATUS_INTERVAL = 30        # Seconds between rebuilding the status even if nothing was committed, as its ages go up on their own
+HEARTBEAT_INTERVAL = 15     # Seconds of nothing to send before a keep-alive comment, so proxies don't drop the connection
+MAX_QUEUED = 100            # Events a client can fall behind by before it's disconnected. Its EventSource just reconnects
+
+
+class StreamHub:
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+        # What was last sent, to diff against
+        self.last_kill_id = 0
+        self.players = {}
+        self.status = None
+
+    def subscribe(self) -> queue.Queue:
+        with self.lock:
+            if self.thread is None:
+                self._load()
+                self.thread = threading.Thread(target=self._watch, name="stream_hub", daemon=True)
+                self.thread.start()
+
+            subscriber = queue.Queue(maxsize=MAX_QUEUED)
+            self.subscribers.add(subscriber)
+
+            # So the client doesn't have to wait for the next change to show anything
+            subscriber.put_nowait(self._format("status", self.status))
+
+        return subscriber
+
+    def unsubscribe(self, subscriber) -> None:
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def _format(self, event, data) -> bytes:
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+    def _publish(self, event, data) -> None:
+        message = self._format(event, data)     # Serialized once, no matter how many clients
+
+        with self.lock:
+            subscribers = list(self.subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Slow client. Drop it rather than buffering forever
+                self.unsubscribe(subscriber)
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(None)
+
+    def _load(self) -> None:
+        with atlas_db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM kills")
+            self.last_kill_id = cursor.fetchone()[0]
+
+        self.players = {player["uuid"]: player for player in build_players()}
+        self.status = build_status()
+
+    def _check_kills(self, cursor) -> None:
+        while True:     # In batches of 50, like `/api/kill_history`
+            cursor.execute(f"""
+                SELECT {KILL_COLUMNS}
+                FROM kills
+                WHERE id > ?
+                ORDER BY id ASC
+                LIMIT 50
+            """, (self.last_kill_id,))
+            kills = [dict(row) for row in cursor.fetchall()]
+
+            if kills:
+                self.last_kill_id = kills[-1]["id"]
+                self._publish("kills", kills)
+
+            if len(kills) < 50:
+                break
+
+    def _check_players(self) -> None:
+        players = {player["uuid"]: player for player in build_players()}
+
+        changed = [player for uuid, player in players.items() if self.players.get(uuid) != player]
+        removed = [uuid for uuid in self.players if uuid not in players]
+        self.players = players
+
+        if changed or removed:
+            self._publish("players", {"changed": changed, "removed": removed})
+
+    def _check_status(self) -> None:
+        status = build_status()
+
+        if status != self.status:
+            self.status = status
+            self._publish("status", status)
+
+    def _watch(self) -> None:
+        # Own connection, as `data_version` only changes when a different connection commits
+        conn = atlas_db.open()
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+
+        data_version = None
+        last_status = time.monotonic()
+
+        while True:
+            try:
+                cursor.execute("PRAGMA data_version")
+                new_data_version = cursor.fetchone()[0]
+
+                if new_data_version != data_version:   # Also true on the first pass, to catch anything since `_load()`
+                    self._check_kills(cursor)
+                    self._check_players()
+                    self._check_status()
+
+                    data_version = new_data_version
+                    last_status = time.monotonic()
+                elif time.monotonic() - last_status > STATUS_INTERVAL:
+                    self._check_status()
+                    last_status = time.monotonic()
+            except Exception:
+                log.error(f"Error in stream hub: {traceback.format_exc()}")
+
+            time.sleep(POLL_INTERVAL)
+
+
+hub = StreamHub()
+
+
+@stream_routes.route("/api/stream")
+def stream():
+    """
+    Server-Sent Events. Sends `kills` (new kill rows), `players` (`changed` rows and `removed` UUIDs)
+    and `status` (the `/api/status` response) as they change. See `onStreamEvent()` in api.js.
+    """
+    try:
+        subscriber = hub.subscribe()
+    except Exception:
+        log.error(f"Internal error subscribing to `stream`: {traceback.format_exc()}")
+        return {"error": "internal error"}, 500
+
+    def events():
+        try:
+            while True:
+                try:
+                    message = subscriber.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield b": keep-alive\n\n"
+                    continue
+
+                if message is None:     # Dropped for falling behind
+                    return
+                yield message
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"   # Stop nginx from buffering the stream, if it's ever put behind one
+    })
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import tempfile
+
+from flask import request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+
+class HashingUpload:
+    """
+    Where an uploaded file is written as the request body is parsed, instead of werkzeug's default
+    in memory/temp file buffer. Hashes as it goes, and stops reading as soon as the file is over the limit.
+
+    `param upload_dir` Directory for the temp file. Should be on the same filesystem as where it ends up,
+    so `save()` is just a rename.
+    `param max_size` Max size of this one file, in bytes.
+    """
+
+    def __init__(self, upload_dir, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.file = tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".upload-", suffix=".part", delete=False)
+
+    def write(self, data) -> int:
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise RequestEntityTooLarge()
+
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        # Everything else (`seek`, `read`, ...) is the temp file's, so werkzeug can use it like any other stream
+        return getattr(self.file, name)
+
+    def hexdigest(self) -> str:
+        return self.sha256.hexdigest()
+
+    def save(self, path) -> None:
+        self.file.close()
+        os.replace(self.file.name, path)
+
+    def discard(self) -> None:
+        self.file.close()
+        try:
+            os.remove(self.file.name)
+        except FileNotFoundError:   # Already saved
+            pass
+
+
+def parse_upload(upload_dir, max_file_size) -> tuple:
+    """
+    Parses the current multipart request, writing its files straight into `upload_dir` as `HashingUpload`s.
+    The whole body is still capped by `MAX_CONTENT_LENGTH`, which rejects a too big `Content-Length` before reading anything.
+
+    Returns `(form, files, uploads)`. Every upload in `uploads` has to be `save()`d or `discard()`ed.
+    Raises `RequestEntityTooLarge` if the body or any file is over its limit.
+    """
+    uploads = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        upload = HashingUpload(upload_dir, max_file_size)
+        uploads.append(upload)
+        return upload
+
+    parser = request.form_data_parser_class(
+        stream_factory,
+        max_form_memory_size=request.max_form_memory_size,
+        max_content_length=request.max_content_length,
+        cls=request.parameter_storage_class,
+        max_form_parts=request.max_form_parts
+    )
+
+    try:
+        _, form, files = parser.parse(request.stream, request.mimetype, request.content_length, request.mimetype_params)
+    except Exception:
+        for upload in uploads:
+            upload.discard()
+        raise
+
+    return form, files, uploads